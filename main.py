@@ -1,13 +1,19 @@
-from src.core.qqbox import ChatBubbleGenerator, resize_by_scale, get_qq_info
+from src.core.qqbox import ChatBubbleGenerator, get_qq_info, set_http_client
 from src.core.tool import read_json_file, write_json_file
 from src.core.clipboard_manager import ClipboardManager
+from src.core.avatar_store import AvatarStore
 from src.config.config_loader import ConfigLoader
 from src.utils.system_utils import SystemUtils
+from src.utils.platform_backend import get_backend, set_backend
+from src.utils.replay import SessionRecorder
+from src.utils.http_utils import HttpClient
 from src.utils.logger import setup_logger
-from PIL import Image
-import pyperclip
-import keyboard
+from src.core.render_cache import RenderCache
+from concurrent.futures import ThreadPoolExecutor
+import threading
 import logging
+import io
+import uuid
 import time
 import os
 import re
@@ -15,14 +21,28 @@ import re
 class EmojiGenerator:
     """表情生成器主类"""
 
-    def __init__(self):
-        self.config = ConfigLoader.load_config()
+    def __init__(self, config=None, backend=None, qq=None):
+        """
+        Args:
+            config: 配置, 为 None 时从 config/config.yaml 加载
+            backend: 平台后端, 为 None 时使用 Windows 后端
+            qq: 初始 qq 号, 为 None 时从控制台输入
+        """
+        self.config = config or ConfigLoader.load_config()
+        if backend is not None:
+            set_backend(backend)
+        self.backend = get_backend()
         os.environ['avatar_cache_location'] = self.config.avatar_cache_location
-        # 初始化
-        self._initialize()
-        self.qqbox = ChatBubbleGenerator()
+        set_http_client(
+            HttpClient(
+                connect_timeout=self.config.http_connect_timeout,
+                read_timeout=self.config.http_read_timeout,
+                retries=self.config.http_retries
+            ),
+            negative_cache_ttl=self.config.negative_cache_ttl,
+            deadline=self.config.http_deadline
+        )
         self.qq = None
-        self.set_qq()
         if not os.path.exists(os.path.join(self.config.avatar_cache_location,"qq_data.json")):
             os.makedirs(os.path.dirname(self.config.avatar_cache_location), exist_ok=True)
             self.qq_title_key = {}
@@ -31,44 +51,158 @@ class EmojiGenerator:
                 self.qq_title_key = read_json_file(os.path.join(self.config.avatar_cache_location,"qq_data.json"))
             except:
                 self.qq_title_key = {}
+        # 身份列表: 在注册热键前读取, 昵称与头像在后台预加载, 热键切换与生成时不再等待输入和网络请求
+        self.roster = self._load_roster()
+        self.roster_index = 0
+        self.roster_info = {}
+        # 初始化
+        self._initialize()
+        memory_budget = self.config.render_memory_budget_mb
+        avatar_store = None
+        if self.config.use_avatar_store:
+            avatar_store = AvatarStore(os.path.join(self.config.avatar_cache_location, "store"))
+            avatar_store.compact(self.config.avatar_cache_location)
+        self.qqbox = ChatBubbleGenerator(
+            memory_budget=int(memory_budget * 1024 * 1024) if memory_budget else None,
+            avatar_store=avatar_store,
+            output_scale=self.config.output_scale,
+            render_threads=self.config.render_threads
+        )
+        # 长消息分页时在后台按顺序渲染后续页
+        self._render_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="render")
+        self.render_cache = None
+        if self.config.use_render_cache:
+            self.render_cache = RenderCache(
+                os.path.join(self.config.avatar_cache_location, "render_cache"),
+                int(self.config.render_cache_max_mb * 1024 * 1024)
+            )
+        self.recorder = None
+        if self.config.session_record_dir:
+            self.recorder = SessionRecorder(self.config.session_record_dir)
+        # 最近一次生成的各阶段耗时
+        self.last_timings = {}
+        # 预加载使用独立线程, 不占用渲染后续页与写入渲染缓存的线程
+        if self.roster:
+            threading.Thread(target=self._prewarm_roster, name="roster-prewarm", daemon=True).start()
+        if qq is None and self.roster:
+            self.select_identity(0)
+        else:
+            self.set_qq(qq)
 
     def _initialize(self):
         """初始化应用"""
-        setup_logger(self.config.logging_level)
+        setup_logger(
+            self.config.logging_level,
+            log_file=self.config.log_file,
+            max_bytes=self.config.log_max_bytes,
+            backup_count=self.config.log_backup_count,
+            json_format=self.config.log_json
+        )
         self._register_hotkeys()
         logging.info("表情生成器初始化完成")
         logging.info(f"热键绑定: {self.config.hotkey}")
         logging.info(f"允许的进程: {self.config.allowed_processes}")
 
-    def set_qq(self):
-        self.qq = input("QQ:")
-        if get_qq_info(self.qq) is None:
+    def set_qq(self, qq=None):
+        self.qq = qq if qq is not None else input("QQ:")
+        info = get_qq_info(self.qq)
+        if info is None or info.get("placeholder"):
             logging.info(f"没找到对应qq")
 
+    # ------------------------------------------------------------------------------
+    # 身份列表
+    # ------------------------------------------------------------------------------
+    def _load_roster(self):
+        """读取配置中的身份列表, 配置的头衔/备注只在 qq_data.json 中没有记录时生效"""
+        roster = []
+        for entry in self.config.roster:
+            qq = str(entry["qq"])
+            roster.append(qq)
+            if qq not in self.qq_title_key and any(entry.get(k) is not None for k in ("color", "content", "notes")):
+                self.qq_title_key[qq] = {
+                    "color": str(entry["color"]) if entry.get("color") is not None else None,
+                    "content": entry.get("content"),
+                    "notes": entry.get("notes")
+                }
+        return roster
+
+    def _prewarm_roster(self):
+        """获取身份列表中每个 qq 的昵称与头像, 并预先渲染一次, 使头像库、字体与字形图集就绪"""
+        for qq in self.roster:
+            start = time.perf_counter()
+            try:
+                info = get_qq_info(qq)
+                display_list = self.qqbox.layout_message(qq, "你好", None, self.qq_title_key, info=info)
+                self.qqbox.render_display_list(display_list)
+            except Exception as e:
+                logging.warning(f"预加载身份 {qq} 失败: {e}")
+                continue
+            if self._is_complete_info(info):
+                self.roster_info[qq] = info
+            else:
+                # 占位头像或以 qq 号代替的昵称不保存, 生成时仍经过 get_qq_info, 负缓存过期后重新获取
+                logging.info(f"身份 {qq} 暂时使用占位头像或 qq 号作为昵称")
+            logging.debug(f"身份 {qq}({info['name']}) 预加载耗时 {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    @staticmethod
+    def _is_complete_info(info):
+        """qq 信息是否为正式结果(昵称与头像都获取成功)"""
+        return not info.get("placeholder") and not info.get("placeholder_name")
+
+    def select_identity(self, index):
+        """切换到身份列表中的第 index 个身份"""
+        if not self.roster:
+            logging.info("未配置身份列表(roster)")
+            return
+        self.roster_index = index % len(self.roster)
+        self.qq = self.roster[self.roster_index]
+        info = self.roster_info.get(self.qq)
+        name = info["name"] if info is not None else "预加载中"
+        logging.info(f"切换身份: {self.qq}({name})")
+
+    def next_identity(self):
+        self.select_identity(self.roster_index + 1)
+
+    def prev_identity(self):
+        self.select_identity(self.roster_index - 1)
+
     def _register_hotkeys(self):
         """注册热键"""
         # 主生成热键
-        keyboard.add_hotkey(
+        self.backend.add_hotkey(
             self.config.hotkey,
             self.generate_image,
             suppress=self.config.block_hotkey or self.config.hotkey == self.config.send_hotkey,
         )
 
-        keyboard.add_hotkey(
+        self.backend.add_hotkey(
             "ctrl+1",
             self.set_qq,
         )
 
-        keyboard.add_hotkey(
+        self.backend.add_hotkey(
             "ctrl+2",
             self.set_title,
         )
 
-        keyboard.add_hotkey(
+        self.backend.add_hotkey(
             "ctrl+3",
             self.set_note,
         )
 
+        # 身份列表切换
+        if self.config.roster:
+            if self.config.roster_next_hotkey:
+                self.backend.add_hotkey(self.config.roster_next_hotkey, self.next_identity)
+            if self.config.roster_prev_hotkey:
+                self.backend.add_hotkey(self.config.roster_prev_hotkey, self.prev_identity)
+            if self.config.roster_select_modifier:
+                for i in range(min(9, len(self.config.roster))):
+                    self.backend.add_hotkey(
+                        f"{self.config.roster_select_modifier}+{i + 1}",
+                        lambda i=i: self.select_identity(i)
+                    )
+
     def set_title(self):
         color = input("颜色:(1.灰色,2.紫色,3.黄色,4.绿色;请直接输入数字)")
         match = re.search(r'[1-4]', color)
@@ -97,6 +231,10 @@ class EmojiGenerator:
 
     def generate_image(self):
         """生成图像的主函数"""
+        request_id = uuid.uuid4().hex[:8]
+        timings = {}
+        start = time.perf_counter()
+
         # 检查进程权限
         if not self._check_process_permission():
             return
@@ -108,30 +246,92 @@ class EmojiGenerator:
             self.config.cut_hotkey,
             self.config.delay
         )
+        timings["input_ms"] = round((time.perf_counter() - start) * 1000, 2)
 
-        logging.debug(f"用户输入 - 文本: '{user_text}'")
+        logging.debug(f"用户输入 - 文本: '{user_text}'", extra={"request_id": request_id})
 
         # 处理输入
         if ((not user_text) and (user_image is None)):
-            logging.info("未检测到文本或图片输入，取消生成")
+            logging.info("未检测到文本或图片输入，取消生成", extra={"request_id": request_id})
             return
 
-        # 生成图片
+        # 渲染缓存: 相同的消息直接使用之前编码好的剪贴板数据, 跳过布局、光栅化和编码
         # -------------------------------------------------------------
-        png = resize_by_scale(
-            self.qqbox.create_chat_message(
+        stage = time.perf_counter()
+        # 身份列表中已预加载成功的 qq 不再经过 get_qq_info; 其余 qq(包括预加载时只得到占位结果的身份)
+        # 只查询一次, 渲染缓存的键与布局共用, 查询成功后记入身份列表
+        info = self.roster_info.get(self.qq)
+        if info is None:
+            info = get_qq_info(self.qq)
+            if self.qq in self.roster and self._is_complete_info(info):
+                self.roster_info[self.qq] = info
+        cache_key = None
+        cached = None
+        if self.render_cache is not None:
+            cache_key = RenderCache.make_key(
+                self.qqbox.profile_version(self.qq, self.qq_title_key, info),
+                user_text,
+                RenderCache.image_digest(user_image),
+                self.qqbox.style_key(),
+                self.config.page_max_height
+            )
+            cached = self.render_cache.get(cache_key)
+            timings["cache"] = "miss" if cached is None else "hit"
+
+        if cached is not None:
+            first = cached[0]
+            rest = [(lambda page=page: page) for page in cached[1:]]
+        else:
+            # 生成图片(长消息按页拆分, 首页渲染完立即发送, 其余页在后台渲染)
+            pages = self.qqbox.layout_pages(
                 qq = self.qq,
                 text = user_text,
                 image = user_image,
-                qq_title_key = self.qq_title_key
-            ),
-            1.0
+                qq_title_key = self.qq_title_key,
+                max_height = self.config.page_max_height,
+                info = info
+            )
+            first = self._render_page(*pages[0])
+            rest = [self._render_pool.submit(self._render_page, *page).result for page in pages[1:]]
+        timings["render_ms"] = round((time.perf_counter() - stage) * 1000, 2)
+        timings["pages"] = 1 + len(rest)
+
+        # 输出结果(按原顺序)
+        stage = time.perf_counter()
+        outputs = [first]
+        self._output_result(first[1], old_clipboard, request_id)
+        for result in rest:
+            outputs.append(result())
+            self._output_result(outputs[-1][1], old_clipboard, request_id)
+        timings["output_ms"] = round((time.perf_counter() - stage) * 1000, 2)
+
+        if cached is None and cache_key is not None:
+            self._render_pool.submit(self._store_render_cache, cache_key, outputs)
+        timings["total_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        self.last_timings = timings
+        if self.recorder is not None:
+            self.recorder.record(
+                self.qq, user_text, user_image, self.qq_title_key.get(str(self.qq)), timings
+            )
+        logging.info(
+            f"请求 {request_id} 各阶段耗时(ms): {timings}",
+            extra={"request_id": request_id, "timings": timings}
         )
-        if not png:
-            return
 
-        # 输出结果
-        self._output_result(png, old_clipboard)
+    def _render_page(self, display_list, image):
+        """渲染一页并编码为剪贴板数据, 返回 (图片, DIB 数据)"""
+        png = self.qqbox.render_display_list(display_list, image)
+        return png, ClipboardManager.encode_dib(png)
+
+    def _store_render_cache(self, cache_key, outputs):
+        """把渲染结果编码为 PNG 后写入渲染缓存"""
+        pages = []
+        for png, dib in outputs:
+            with io.BytesIO() as output:
+                png.save(output, "PNG")
+                pages.append((output.getvalue(), dib))
+        self.render_cache.put(cache_key, pages)
+        logging.debug(f"渲染缓存统计: {self.render_cache.stats()}")
 
     def _check_process_permission(self) -> bool:
         """检查进程权限"""
@@ -144,33 +344,33 @@ class EmojiGenerator:
         if not allowed:
             logging.info(f"当前进程 {current_process} 不在允许列表中，跳过执行")
             if not self.config.block_hotkey:
-                keyboard.send(self.config.hotkey)
+                self.backend.send_hotkey(self.config.hotkey)
             return False
 
         return True
 
-    def _output_result(self, png: Image, old_clipboard: str):
+    def _output_result(self, dib: bytes, old_clipboard: str, request_id: str = None):
         """输出结果到剪贴板并执行后续操作"""
         # 复制到剪贴板
-        ClipboardManager.copy_png_to_clipboard(png)
+        ClipboardManager.copy_dib_to_clipboard(dib)
 
         # 自动粘贴和发送
         if self.config.auto_paste_image:
-            keyboard.send(self.config.paste_hotkey)
-            time.sleep(self.config.delay)
+            self.backend.send_hotkey(self.config.paste_hotkey)
+            self.backend.sleep(self.config.delay)
 
             if self.config.auto_send_image:
-                keyboard.send(self.config.send_hotkey)
+                self.backend.send_hotkey(self.config.send_hotkey)
 
         # 恢复原始剪贴板内容
-        pyperclip.copy(old_clipboard)
-        logging.info("成功地生成并发送图片！")
+        self.backend.set_text(old_clipboard)
+        logging.info("成功地生成并发送图片！", extra={"request_id": request_id})
 
     def run(self):
         """运行主循环"""
         logging.info("键盘监听已启动，按下 {} 以生成图片".format(self.config.hotkey))
         try:
-            keyboard.wait()
+            self.backend.wait()
         except KeyboardInterrupt:
             logging.info("程序已退出")
         except Exception as e:
@@ -0,0 +1,49 @@
+from src.utils.replay import load_session, replay_session
+from src.utils.platform_backend import FakeBackend
+from src.config.config_loader import ConfigLoader
+from main import EmojiGenerator
+import argparse
+import logging
+import json
+
+
+def main():
+    """回放录制的会话并统计端到端延迟: python replay.py <会话目录>"""
+    parser = argparse.ArgumentParser(description="回放录制的会话并统计端到端延迟")
+    parser.add_argument("session", help="会话目录(包含 session.jsonl)")
+    parser.add_argument("--config", default="config/config.yaml", help="配置文件")
+    parser.add_argument("--repeat", type=int, default=1, help="回放轮数")
+    parser.add_argument("--realtime", action="store_true", help="按录制时的间隔回放")
+    parser.add_argument("--hotkey-latency-ms", type=float, default=0.0, help="模拟每次按键的系统延迟")
+    parser.add_argument("--clipboard-latency-ms", type=float, default=0.0, help="模拟每次读写剪贴板的系统延迟")
+    parser.add_argument("--process", default="qq.exe", help="模拟的前台进程")
+    parser.add_argument("--no-render-cache", action="store_true", help="禁用渲染缓存")
+    args = parser.parse_args()
+
+    events = load_session(args.session)
+    if not events:
+        print("会话为空")
+        return
+
+    config = ConfigLoader.load_config(args.config)
+    config.session_record_dir = None
+    if args.no_render_cache:
+        config.use_render_cache = False
+    backend = FakeBackend(
+        process_name=args.process,
+        hotkey_latency=args.hotkey_latency_ms / 1000,
+        clipboard_latency=args.clipboard_latency_ms / 1000,
+        select_all_hotkey=config.select_all_hotkey,
+        cut_hotkey=config.cut_hotkey,
+        paste_hotkey=config.paste_hotkey,
+        send_hotkey=config.send_hotkey
+    )
+    generator = EmojiGenerator(config=config, backend=backend, qq=events[0]["qq"])
+    logging.getLogger().setLevel(logging.WARNING)
+
+    report = replay_session(generator, backend, events, args.repeat, args.realtime)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+渲染内存分配基准: 统计各类消息渲染时分配的中间图像数量、字节数与耗时
+
+用法:
+    python scripts/bench_allocations.py [--scale 1.0] [--image 800x600] [--rounds 5] [--threads N]
+
+头像使用临时生成的图片, 不发起网络请求。分配信息来自 Rasterizer.last_allocations。
+指定 --threads 时另外比较图文消息在 render_threads=0 与 N 下的实际耗时(需在多核机器上运行才有差别)。
+"""
+from PIL import Image
+import statistics
+import argparse
+import tempfile
+import time
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.qqbox import ChatBubbleGenerator
+
+BYTES_PER_PIXEL = {"RGBA": 4, "RGB": 3, "L": 1}
+
+
+def report(name, allocations, elapsed):
+    total = 0
+    by_purpose = {}
+    largest = ("", "", (0, 0), 0)
+    for purpose, mode, (w, h) in allocations:
+        size = w * h * BYTES_PER_PIXEL.get(mode, 4)
+        total += size
+        count, nbytes = by_purpose.get(purpose, (0, 0))
+        by_purpose[purpose] = (count + 1, nbytes + size)
+        if size > largest[3]:
+            largest = (purpose, mode, (w, h), size)
+    print(f"{name:<10} {len(allocations):3d} 张图像  {total / 1024 / 1024:8.2f} MB  {elapsed:8.1f} ms")
+    print(f"{'':<10} 最大: {largest[0]} {largest[1]} {largest[2][0]}x{largest[2][1]} ({largest[3] / 1024 / 1024:.2f} MB)")
+    for purpose, (count, nbytes) in sorted(by_purpose.items(), key=lambda kv: -kv[1][1]):
+        print(f"{'':<12}{purpose:<22}{count:3d}  {nbytes / 1024 / 1024:8.2f} MB")
+
+
+def compare_threads(info, title, image, scale, threads, rounds):
+    """图文消息在串行与并行渲染下的耗时(ms), 并确认输出一致"""
+    results = {}
+    outputs = {}
+    for render_threads in (0, threads):
+        generator = ChatBubbleGenerator(output_scale=scale, render_threads=render_threads)
+        display_list = generator.layout_engine.layout_message(info, "看这个图片", image.size, title)
+        # 预热字体与头像缓存
+        generator.render_display_list(display_list, image)
+        elapsed = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            outputs[render_threads] = generator.render_display_list(display_list, image)
+            elapsed.append((time.perf_counter() - start) * 1000)
+        results[render_threads] = elapsed
+    print(f"\n图文消息并行渲染 (CPU {os.cpu_count()} 核, {rounds} 轮)")
+    for render_threads, elapsed in results.items():
+        print(
+            f"render_threads={render_threads:<3} 最小 {min(elapsed):8.1f} ms  "
+            f"中位数 {statistics.median(elapsed):8.1f} ms"
+        )
+    speedup = statistics.median(results[0]) / statistics.median(results[threads])
+    identical = outputs[0].tobytes() == outputs[threads].tobytes()
+    print(f"中位数加速 {speedup:.2f}x, 输出{'一致' if identical else '不一致'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="统计消息渲染的中间图像分配")
+    parser.add_argument("--scale", type=float, default=1.0, help="输出倍率")
+    parser.add_argument("--image", default="800x600", help="图片尺寸 WxH")
+    parser.add_argument("--rounds", type=int, default=5, help="计时轮数(取最小值)")
+    parser.add_argument("--threads", type=int, default=0, help="比较 render_threads=0 与此线程数的耗时")
+    args = parser.parse_args()
+
+    iw, ih = (int(v) for v in args.image.split("x"))
+    image = Image.new("RGB", (iw, ih))
+    image.putdata([((i * 7) % 256, (i * 3) % 256, (i * 11) % 256) for i in range(iw * ih)])
+
+    with tempfile.TemporaryDirectory() as directory:
+        avatar_path = os.path.join(directory, "10000-bench.png")
+        Image.new("RGBA", (640, 640), (200, 50, 50, 255)).save(avatar_path)
+        info = {"qq": "10000", "name": "bench", "avatar_path": avatar_path}
+        title = {"color": "2", "content": "管理员", "notes": None}
+
+        generator = ChatBubbleGenerator(output_scale=args.scale)
+        cases = [
+            ("text", "你好世界 hello world " * 6, None),
+            ("image", None, image),
+            ("text+image", "看这个图片", image),
+        ]
+        print(f"输出倍率 {args.scale}, 图片 {iw}x{ih}")
+        for name, text, img in cases:
+            display_list = generator.layout_engine.layout_message(
+                info, text, img.size if img is not None else None, title
+            )
+            best = None
+            for _ in range(args.rounds):
+                start = time.perf_counter()
+                generator.render_display_list(display_list, img)
+                elapsed = (time.perf_counter() - start) * 1000
+                best = elapsed if best is None else min(best, elapsed)
+            report(name, generator.rasterizer.last_allocations, best)
+
+        if args.threads > 0:
+            compare_threads(info, title, image, args.scale, args.threads, max(args.rounds, 10))
+
+
+if __name__ == "__main__":
+    main()
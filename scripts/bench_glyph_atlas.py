@@ -0,0 +1,116 @@
+"""
+字形图集基准测试: 比较 ImageDraw.text 与 GlyphAtlas.draw_text 绘制常见中文消息的耗时
+
+用法:
+    python scripts/bench_glyph_atlas.py [字体路径] [--size 136] [--rounds 20]
+
+字体默认为气泡使用的 resources/fonts/Microsoft-YaHei-Semilight.ttc;
+字体不存在或不包含中文字形时跳过。字号默认 136 (34 号字 x 4 倍 supersampling)。
+"""
+from PIL import Image, ImageChops, ImageDraw, ImageFont
+import argparse
+import time
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.glyph_atlas import GlyphAtlas
+
+DEFAULT_FONT = "./resources/fonts/Microsoft-YaHei-Semilight.ttc"
+
+# 典型聊天消息(单行, 气泡按行绘制)
+MESSAGES = [
+    "你好",
+    "哈哈哈哈哈哈哈",
+    "今天晚上一起吃饭吗？",
+    "我刚到家，等我五分钟",
+    "这个问题我也不太清楚，明天问问老师吧",
+    "好的好的，没问题！",
+    "刚才那张图片是在哪里拍的？",
+    "周末要不要一起去图书馆复习",
+    "收到，谢谢～",
+    "我觉得这个方案可以，就按这个来吧",
+    "群里有人知道这个怎么弄吗",
+    "笑死我了hhh",
+]
+
+
+def has_cjk(font):
+    """两个不同汉字渲染结果相同(都是缺字方框)时认为字体不含中文字形"""
+    a = font.getmask("中")
+    b = font.getmask("国")
+    if a.size == (0, 0) or b.size == (0, 0):
+        return False
+    return a.size != b.size or bytes(a) != bytes(b)
+
+
+def canvas_for(font, text):
+    width = int(font.getlength(text)) + font.size
+    return Image.new("RGBA", (width, font.size * 2), (0, 0, 0, 0))
+
+
+def bench_imagedraw(font, messages, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text in messages:
+            canvas = canvas_for(font, text)
+            ImageDraw.Draw(canvas).text((0, 0), text, fill=(0, 0, 0, 255), font=font)
+    return (time.perf_counter() - start) * 1000 / (rounds * len(messages))
+
+
+def bench_atlas(font, messages, rounds, atlas):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text in messages:
+            canvas = canvas_for(font, text)
+            atlas.draw_text(canvas, (0, 0), text, font, ("bubble", font.size), (0, 0, 0, 255))
+    return (time.perf_counter() - start) * 1000 / (rounds * len(messages))
+
+
+def max_difference(font, messages):
+    """两种方式绘制结果的最大像素差"""
+    atlas = GlyphAtlas()
+    worst = 0
+    for text in messages:
+        a, b = canvas_for(font, text), canvas_for(font, text)
+        ImageDraw.Draw(a).text((0, 0), text, fill=(0, 0, 0, 255), font=font)
+        atlas.draw_text(b, (0, 0), text, font, ("bubble", font.size), (0, 0, 0, 255))
+        extrema = ImageChops.difference(a, b).getextrema()
+        worst = max(worst, max(high for _, high in extrema))
+    return worst
+
+
+def main():
+    parser = argparse.ArgumentParser(description="比较 ImageDraw.text 与 GlyphAtlas.draw_text 绘制中文消息的耗时")
+    parser.add_argument("font", nargs="?", default=DEFAULT_FONT, help="包含中文字形的字体文件")
+    parser.add_argument("--size", type=int, default=136, help="像素字号")
+    parser.add_argument("--rounds", type=int, default=20, help="每条消息重复绘制的次数")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.font):
+        print(f"跳过: 字体 {args.font} 不存在")
+        return 0
+    font = ImageFont.truetype(args.font, args.size)
+    if not has_cjk(font):
+        print(f"跳过: 字体 {args.font} 不包含中文字形")
+        return 0
+
+    chars = sum(len(text) for text in MESSAGES)
+    print(f"字体 {args.font}, 字号 {args.size}px, {len(MESSAGES)} 条消息 / {chars} 字, 每条 {args.rounds} 轮")
+
+    baseline = bench_imagedraw(font, MESSAGES, args.rounds)
+    print(f"ImageDraw.text          {baseline:8.3f} ms/条")
+
+    atlas = GlyphAtlas()
+    cold = bench_atlas(font, MESSAGES, 1, atlas)
+    print(f"GlyphAtlas 冷启动       {cold:8.3f} ms/条")
+    warm = bench_atlas(font, MESSAGES, args.rounds, atlas)
+    print(f"GlyphAtlas 预热后       {warm:8.3f} ms/条  ({baseline / warm:.2f}x, 命中率 {atlas.hit_rate:.1%})")
+
+    print(f"最大像素差              {max_difference(font, MESSAGES)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,5 @@
 import os
-from typing import Dict, Any, Tuple, List
+from typing import Dict, Any, Tuple, List, Optional
 import yaml
 from pydantic import BaseModel
 
@@ -19,7 +19,28 @@ class ConfigModel(BaseModel):
     auto_paste_image: bool = DefaultConfig.AUTO_PASTE_IMAGE
     auto_send_image: bool = DefaultConfig.AUTO_SEND_IMAGE
     logging_level: str = DefaultConfig.LOGGING_LEVEL
+    log_file: str = DefaultConfig.LOG_FILE
+    log_max_bytes: int = DefaultConfig.LOG_MAX_BYTES
+    log_backup_count: int = DefaultConfig.LOG_BACKUP_COUNT
+    log_json: bool = DefaultConfig.LOG_JSON
     avatar_cache_location: str = DefaultConfig.AVATAR_CACHE_LOCATION
+    use_avatar_store: bool = DefaultConfig.USE_AVATAR_STORE
+    use_render_cache: bool = DefaultConfig.USE_RENDER_CACHE
+    render_cache_max_mb: float = DefaultConfig.RENDER_CACHE_MAX_MB
+    session_record_dir: Optional[str] = DefaultConfig.SESSION_RECORD_DIR
+    http_connect_timeout: float = DefaultConfig.HTTP_CONNECT_TIMEOUT
+    http_read_timeout: float = DefaultConfig.HTTP_READ_TIMEOUT
+    http_retries: int = DefaultConfig.HTTP_RETRIES
+    http_deadline: float = DefaultConfig.HTTP_DEADLINE
+    negative_cache_ttl: float = DefaultConfig.NEGATIVE_CACHE_TTL
+    render_memory_budget_mb: Optional[float] = DefaultConfig.RENDER_MEMORY_BUDGET_MB
+    page_max_height: Optional[int] = DefaultConfig.PAGE_MAX_HEIGHT
+    output_scale: float = DefaultConfig.OUTPUT_SCALE
+    render_threads: int = DefaultConfig.RENDER_THREADS
+    roster: List[Dict[str, Any]] = DefaultConfig.ROSTER
+    roster_next_hotkey: Optional[str] = DefaultConfig.ROSTER_NEXT_HOTKEY
+    roster_prev_hotkey: Optional[str] = DefaultConfig.ROSTER_PREV_HOTKEY
+    roster_select_modifier: Optional[str] = DefaultConfig.ROSTER_SELECT_MODIFIER
 
     class Config:
         arbitrary_types_allowed = True
@@ -84,7 +105,28 @@ class ConfigLoader:
             'auto_paste_image': DefaultConfig.AUTO_PASTE_IMAGE,
             'auto_send_image': DefaultConfig.AUTO_SEND_IMAGE,
             'logging_level': DefaultConfig.LOGGING_LEVEL,
+            'log_file': DefaultConfig.LOG_FILE,
+            'log_max_bytes': DefaultConfig.LOG_MAX_BYTES,
+            'log_backup_count': DefaultConfig.LOG_BACKUP_COUNT,
+            'log_json': DefaultConfig.LOG_JSON,
             'avatar_cache_location': DefaultConfig.AVATAR_CACHE_LOCATION,
+            'use_avatar_store': DefaultConfig.USE_AVATAR_STORE,
+            'use_render_cache': DefaultConfig.USE_RENDER_CACHE,
+            'render_cache_max_mb': DefaultConfig.RENDER_CACHE_MAX_MB,
+            'session_record_dir': DefaultConfig.SESSION_RECORD_DIR,
+            'http_connect_timeout': DefaultConfig.HTTP_CONNECT_TIMEOUT,
+            'http_read_timeout': DefaultConfig.HTTP_READ_TIMEOUT,
+            'http_retries': DefaultConfig.HTTP_RETRIES,
+            'http_deadline': DefaultConfig.HTTP_DEADLINE,
+            'negative_cache_ttl': DefaultConfig.NEGATIVE_CACHE_TTL,
+            'render_memory_budget_mb': DefaultConfig.RENDER_MEMORY_BUDGET_MB,
+            'page_max_height': DefaultConfig.PAGE_MAX_HEIGHT,
+            'output_scale': DefaultConfig.OUTPUT_SCALE,
+            'render_threads': DefaultConfig.RENDER_THREADS,
+            'roster': DefaultConfig.ROSTER,
+            'roster_next_hotkey': DefaultConfig.ROSTER_NEXT_HOTKEY,
+            'roster_prev_hotkey': DefaultConfig.ROSTER_PREV_HOTKEY,
+            'roster_select_modifier': DefaultConfig.ROSTER_SELECT_MODIFIER,
         }
 
         with open(config_file, 'w', encoding='utf-8') as f:
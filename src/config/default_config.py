@@ -1,4 +1,4 @@
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
 
 class DefaultConfig:
@@ -24,6 +24,46 @@ class DefaultConfig:
 
     # 日志配置
     LOGGING_LEVEL = "INFO"
+    LOG_FILE = "emoji_generator.log"
+    LOG_MAX_BYTES = 5 * 1024 * 1024
+    LOG_BACKUP_COUNT = 3
+    LOG_JSON = False
+
+    # 网络请求
+    HTTP_CONNECT_TIMEOUT = 2.0
+    HTTP_READ_TIMEOUT = 3.0
+    HTTP_RETRIES = 2
+    HTTP_DEADLINE = 5.0
+    NEGATIVE_CACHE_TTL = 300
 
     # 头像缓存位置
-    AVATAR_CACHE_LOCATION = "./avatar"
\ No newline at end of file
+    AVATAR_CACHE_LOCATION = "./avatar"
+
+    # 是否使用内存映射的打包头像库
+    USE_AVATAR_STORE = True
+
+    # 渲染结果缓存
+    USE_RENDER_CACHE = True
+    RENDER_CACHE_MAX_MB = 64
+
+    # 会话录制目录(为空时不录制), 供 python replay.py 回放
+    SESSION_RECORD_DIR = None
+
+    # 输出倍率, 2.0 为 HiDPI, 0.5 为缩略图
+    OUTPUT_SCALE = 1.0
+
+    # 消息内并行渲染的线程数, 0 表示按顺序渲染
+    RENDER_THREADS = 0
+
+    # 身份列表, 每项为 {"qq", 可选 "color", "content", "notes"}
+    ROSTER = []
+    ROSTER_NEXT_HOTKEY = "ctrl+4"
+    ROSTER_PREV_HOTKEY = "ctrl+5"
+    # 与数字键组合直接选择第 N 个身份, 如 "ctrl+alt" 对应 ctrl+alt+1 ~ ctrl+alt+9
+    ROSTER_SELECT_MODIFIER = "ctrl+alt"
+
+    # 长消息分页: 单个气泡的最大高度(像素), None 表示不分页
+    PAGE_MAX_HEIGHT: Optional[int] = None
+
+    # 渲染内存预算(MB), None 表示不限制
+    RENDER_MEMORY_BUDGET_MB: Optional[float] = None
\ No newline at end of file
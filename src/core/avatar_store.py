@@ -0,0 +1,249 @@
+from typing import Dict, Optional, Tuple
+from PIL import Image
+import threading
+import logging
+import mmap
+import json
+import time
+import os
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+
+class _FileLock:
+    """跨进程文件锁, 用于串行化多个渲染进程对头像库的写入"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = None
+
+    def __enter__(self):
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT)
+        if os.name == "nt":
+            while True:
+                try:
+                    msvcrt.locking(self._fd, msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.01)
+        else:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            if os.name == "nt":
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+
+class AvatarStore:
+    """
+    内存映射的打包头像库
+
+    已裁剪为圆形、已缩放到目标尺寸的 RGBA 头像依次追加到一个打包文件中,
+    索引文件记录每个头像的偏移与尺寸。读取时直接在 mmap 上 Image.frombuffer,
+    不需要打开单独的 PNG 文件, 也不需要解码。
+
+    打包文件只追加不修改, 索引通过临时文件 + os.replace 原子替换,
+    因此多个渲染进程可以同时读取; 写入由文件锁串行化。
+    compact() 会把仍在使用的头像写入新一代打包文件, 旧文件在不再被映射后删除。
+    """
+
+    INDEX_NAME = "index.json"
+    LOCK_NAME = "store.lock"
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._index_path = os.path.join(directory, self.INDEX_NAME)
+        self._lock_path = os.path.join(directory, self.LOCK_NAME)
+        self._lock = threading.Lock()
+
+        self._pack_name: Optional[str] = None
+        self._entries: Dict[str, Tuple[int, int, int]] = {}
+        self._index_stamp = None
+        self._mmaps: Dict[str, mmap.mmap] = {}
+        self._files = {}
+        self._reload_index()
+
+    # ------------------------------------------------------------------------------
+    # 索引
+    # ------------------------------------------------------------------------------
+    @staticmethod
+    def make_key(path: str, size: Tuple[int, int]) -> str:
+        """由头像文件及目标尺寸生成键, 源文件被修改后键随之变化"""
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            mtime = 0
+        return f"{os.path.basename(path)}|{mtime}|{size[0]}x{size[1]}"
+
+    def _read_index(self):
+        try:
+            with open(self._index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"generation": 0, "pack": None, "entries": {}}
+
+    def _write_index(self, index):
+        tmp_path = f"{self._index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False)
+        os.replace(tmp_path, self._index_path)
+
+    def _reload_index(self) -> bool:
+        """索引文件发生变化时重新加载, 返回是否重新加载"""
+        try:
+            st = os.stat(self._index_path)
+            stamp = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            stamp = None
+        if stamp == self._index_stamp:
+            return False
+        index = self._read_index()
+        self._pack_name = index.get("pack")
+        self._entries = {k: tuple(v) for k, v in index.get("entries", {}).items()}
+        self._index_stamp = stamp
+        return True
+
+    # ------------------------------------------------------------------------------
+    # 内存映射
+    # ------------------------------------------------------------------------------
+    def _get_mmap(self, pack_name: str, end: int) -> Optional[mmap.mmap]:
+        """获取至少覆盖到 end 字节的映射, 打包文件变长后重新映射"""
+        mm = self._mmaps.get(pack_name)
+        if mm is not None and len(mm) >= end:
+            return mm
+        path = os.path.join(self.directory, pack_name)
+        f = self._files.get(pack_name)
+        if f is None:
+            f = open(path, "rb")
+            self._files[pack_name] = f
+        size = os.fstat(f.fileno()).st_size
+        if size < end:
+            return None
+        # 旧映射可能仍被已返回的图片引用, 交给垃圾回收释放
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._mmaps[pack_name] = mm
+        return mm
+
+    def get(self, key: str) -> Optional[Image.Image]:
+        """读取头像, 不存在时返回 None。返回的图片直接引用映射内存, 只读"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and self._reload_index():
+                entry = self._entries.get(key)
+            if entry is None or self._pack_name is None:
+                return None
+            offset, w, h = entry
+            try:
+                mm = self._get_mmap(self._pack_name, offset + w * h * 4)
+            except OSError as e:
+                # 打包文件已被其他进程压缩删除, 重新加载索引, 由调用方解码源文件
+                logging.debug(f"读取头像库失败: {e}")
+                self._index_stamp = None
+                self._reload_index()
+                return None
+            if mm is None:
+                return None
+            buffer = memoryview(mm)[offset:offset + w * h * 4]
+        return Image.frombuffer("RGBA", (w, h), buffer, "raw", "RGBA", 0, 1)
+
+    def put(self, key: str, image: Image.Image):
+        """追加写入一个头像"""
+        image = image.convert("RGBA")
+        data = image.tobytes()
+        with self._lock, _FileLock(self._lock_path):
+            index = self._read_index()
+            if key in index.get("entries", {}):
+                # 其他进程已经写入
+                self._reload_index()
+                return
+            pack_name = index.get("pack")
+            if pack_name is None:
+                pack_name = f"avatars.{index.get('generation', 0)}.pack"
+                index["pack"] = pack_name
+            with open(os.path.join(self.directory, pack_name), "ab") as f:
+                offset = f.seek(0, os.SEEK_END)
+                f.write(data)
+            index.setdefault("entries", {})[key] = [offset, image.width, image.height]
+            self._write_index(index)
+            self._reload_index()
+
+    def get_or_create(self, path: str, size: Tuple[int, int]) -> Image.Image:
+        """读取头像, 未命中时解码源文件、缩放后写入头像库"""
+        key = self.make_key(path, size)
+        avatar = self.get(key)
+        if avatar is None:
+            avatar = Image.open(path).convert("RGBA")
+            avatar = avatar.resize(size, Image.Resampling.LANCZOS)
+            try:
+                self.put(key, avatar)
+            except OSError as e:
+                logging.warning(f"写入头像库失败: {e}")
+        return avatar
+
+    # ------------------------------------------------------------------------------
+    # 压缩
+    # ------------------------------------------------------------------------------
+    def compact(self, avatar_dir: Optional[str] = None):
+        """
+        重写打包文件, 只保留仍然有效的头像
+
+        Args:
+            avatar_dir: 头像源文件目录, 指定时丢弃源文件已被修改或删除的条目
+        """
+        with self._lock, _FileLock(self._lock_path):
+            index = self._read_index()
+            old_pack = index.get("pack")
+            if old_pack is None:
+                return
+            live = {}
+            for key, (offset, w, h) in index.get("entries", {}).items():
+                if avatar_dir is not None:
+                    # 文件名(昵称)中可能包含 "|", 从右侧拆分
+                    name, mtime, _ = key.rsplit("|", 2)
+                    path = os.path.join(avatar_dir, name)
+                    if not os.path.exists(path) or str(os.stat(path).st_mtime_ns) != mtime:
+                        continue
+                live[key] = (offset, w, h)
+            pack_size = os.path.getsize(os.path.join(self.directory, old_pack))
+            if pack_size == sum(w * h * 4 for _, w, h in live.values()):
+                # 没有可回收的空间
+                return
+
+            generation = index.get("generation", 0) + 1
+            new_pack = f"avatars.{generation}.pack"
+            entries = {}
+            with open(os.path.join(self.directory, old_pack), "rb") as src, \
+                    open(os.path.join(self.directory, new_pack), "wb") as dst:
+                for key, (offset, w, h) in live.items():
+                    src.seek(offset)
+                    entries[key] = [dst.tell(), w, h]
+                    dst.write(src.read(w * h * 4))
+            self._write_index({"generation": generation, "pack": new_pack, "entries": entries})
+            self._reload_index()
+            self._remove_stale_packs(new_pack)
+
+    def _remove_stale_packs(self, current: str):
+        for name in os.listdir(self.directory):
+            if name.startswith("avatars.") and name.endswith(".pack") and name != current:
+                # 本进程的旧映射可能仍被已返回的图片引用, 只释放引用不主动关闭
+                self._mmaps.pop(name, None)
+                f = self._files.pop(name, None)
+                if f is not None:
+                    f.close()
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    # 其他进程仍在映射(Windows), 下次压缩时再删除
+                    pass
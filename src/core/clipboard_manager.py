@@ -1,31 +1,31 @@
+from src.utils.platform_backend import get_backend
 from typing import Optional, Tuple
 from PIL import Image
-import win32clipboard
-import pyperclip
-import keyboard
 import logging
-import time
 import io
 
 class ClipboardManager:
     """剪贴板管理类"""
 
+    @staticmethod
+    def encode_dib(image: Image) -> bytes:
+        """将图像编码为剪贴板使用的DIB数据"""
+        # 转换为BMP格式（Windows剪贴板需要）
+        with io.BytesIO() as output:
+            image.convert("RGB").save(output, "BMP")
+            return output.getvalue()[14:]  # 去掉BMP文件头
+
     @staticmethod
     def copy_png_to_clipboard(png: Image):
         """将PNG字节流复制到剪贴板"""
-        try:
-            image = png
-
-            # 转换为BMP格式（Windows剪贴板需要）
-            with io.BytesIO() as output:
-                image.convert("RGB").save(output, "BMP")
-                bmp_data = output.getvalue()[14:]  # 去掉BMP文件头
+        ClipboardManager.copy_dib_to_clipboard(ClipboardManager.encode_dib(png))
 
+    @staticmethod
+    def copy_dib_to_clipboard(bmp_data: bytes):
+        """将已编码的DIB数据复制到剪贴板"""
+        try:
             # 写入剪贴板
-            win32clipboard.OpenClipboard()
-            win32clipboard.EmptyClipboard()
-            win32clipboard.SetClipboardData(win32clipboard.CF_DIB, bmp_data)
-            win32clipboard.CloseClipboard()
+            get_backend().set_dib(bmp_data)
 
         except Exception as e:
             logging.error(f"复制到剪贴板失败: {e}")
@@ -38,19 +38,14 @@ class ClipboardManager:
             delay: float = 0.1
     ) -> Optional[Image.Image]:
         """从剪贴板获取图像"""
-        keyboard.send(select_hotkey)
-        time.sleep(delay)
-        keyboard.send(cut_hotkey)
-        time.sleep(delay)
+        backend = get_backend()
+        backend.send_hotkey(select_hotkey)
+        backend.sleep(delay)
+        backend.send_hotkey(cut_hotkey)
+        backend.sleep(delay)
         try:
-            win32clipboard.OpenClipboard()
-
-            # 检查剪贴板中是否有图像
-            if not win32clipboard.IsClipboardFormatAvailable(win32clipboard.CF_DIB):
-                return None
-
             # 获取图像数据
-            data = win32clipboard.GetClipboardData(win32clipboard.CF_DIB)
+            data = backend.get_dib()
             if not data:
                 return None
 
@@ -66,11 +61,6 @@ class ClipboardManager:
         except Exception as e:
             logging.error(f"从剪贴板获取图像失败: {e}")
             return None
-        finally:
-            try:
-                win32clipboard.CloseClipboard()
-            except Exception:
-                pass
 
     @staticmethod
     def cut_all_and_get_text(
@@ -84,20 +74,22 @@ class ClipboardManager:
         Returns:
             Tuple[新剪贴板内容, 原剪贴板内容]
         """
+        backend = get_backend()
+
         # 备份原剪贴板内容
-        old_clipboard = pyperclip.paste()
+        old_clipboard = backend.get_text()
 
         # 清空剪贴板
-        pyperclip.copy("")
+        backend.set_text("")
 
         # 发送全选和剪切快捷键
-        keyboard.send(select_hotkey)
-        time.sleep(delay)
-        keyboard.send(cut_hotkey)
-        time.sleep(delay)
+        backend.send_hotkey(select_hotkey)
+        backend.sleep(delay)
+        backend.send_hotkey(cut_hotkey)
+        backend.sleep(delay)
 
         # 获取剪切后的内容
-        new_clipboard = pyperclip.paste()
+        new_clipboard = backend.get_text()
 
         return new_clipboard, old_clipboard
 
@@ -0,0 +1,92 @@
+from collections import OrderedDict
+from PIL import Image, ImageDraw
+import threading
+
+
+class GlyphAtlas:
+    """
+    字形图集：缓存预渲染好的字形透明度位图 (LRU)
+
+    聊天文字重复度很高, 同一字形只需 FreeType 光栅化一次, 之后按布局位置直接贴图。
+    字形以 (字体角色, 像素字号, 字符) 为键, 像素字号已包含 supersampling 倍率。
+    """
+
+    def __init__(self, capacity=2048):
+        self.capacity = capacity
+        self._glyphs = OrderedDict()
+        self._advances = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _lru_get(self, cache, key):
+        with self._lock:
+            value = cache.get(key)
+            if value is not None:
+                cache.move_to_end(key)
+            return value
+
+    def _lru_put(self, cache, key, value):
+        with self._lock:
+            cache[key] = value
+            if len(cache) > self.capacity:
+                cache.popitem(last=False)
+
+    def get_glyph(self, font, font_key, ch):
+        """
+        获取字形位图
+
+        Returns:
+            Tuple[Optional[Image], Tuple[int, int]]: L 模式位图(空白字符为 None)及其相对文字原点的偏移
+        """
+        key = font_key + (ch,)
+        glyph = self._lru_get(self._glyphs, key)
+        if glyph is not None:
+            self.hits += 1
+            return glyph
+        self.misses += 1
+
+        left, top, right, bottom = font.getbbox(ch)
+        if right <= left or bottom <= top:
+            glyph = (None, (0, 0))
+        else:
+            bitmap = Image.new("L", (right - left, bottom - top), 0)
+            ImageDraw.Draw(bitmap).text((-left, -top), ch, fill=255, font=font)
+            glyph = (bitmap, (left, top))
+        self._lru_put(self._glyphs, key, glyph)
+        return glyph
+
+    def get_advance(self, font, font_key, prev, ch):
+        """从字符 prev 的原点到下一个字符 ch 的原点的距离(包含两者之间的字距调整)"""
+        key = font_key + (prev, ch)
+        advance = self._lru_get(self._advances, key)
+        if advance is None:
+            advance = font.getlength(prev + ch) - font.getlength(ch)
+            self._lru_put(self._advances, key, advance)
+        return advance
+
+    def draw_text(self, canvas, xy, text, font, font_key, fill):
+        """
+        在画布上绘制单行文字, 效果与 ImageDraw.text 相同
+
+        Args:
+            canvas: 目标画布
+            xy: 文字原点(左上角)
+            font_key: 字体在图集中的键, 如 ("bubble", 136)
+            fill: 文字颜色
+        """
+        x, y = xy
+        prev = None
+        for ch in text:
+            if prev is not None:
+                x += self.get_advance(font, font_key, prev, ch)
+            bitmap, (left, top) = self.get_glyph(font, font_key, ch)
+            if bitmap is not None:
+                px, py = round(x + left), round(y + top)
+                canvas.paste(fill, (px, py, px + bitmap.width, py + bitmap.height), bitmap)
+            prev = ch
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
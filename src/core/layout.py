@@ -0,0 +1,375 @@
+from collections import OrderedDict
+from PIL import Image, ImageDraw
+import threading
+
+# ------------------------------------------------------------------------------
+# 显示列表布局引擎
+#
+# 显示列表是一个可 JSON 序列化的 dict, 所有坐标均为 1 倍输出尺寸下的逻辑像素:
+#   {
+#       "width": 总宽, "height": 总高, "background": [r, g, b, a],
+#       "layers": [
+#           {"box": [x, y, w, h], "supersample": bool, "items": [图元, ...]},
+#       ]
+#   }
+# 图元坐标相对于所在图层左上角:
+#   {"op": "rounded_rect", "box": [x0, y0, x1, y1], "radius", "fill", "outline", "width"}
+#   {"op": "text", "xy": [x, y], "text", "font": 字体角色, "size": 字号, "fill"}
+#   {"op": "image", "source": 图片名, "box": [...], "clip": [...], "radius"}
+#   {"op": "avatar", "path": 头像路径, "box": [...]}
+# ------------------------------------------------------------------------------
+
+TITLE_COLOR_MAP = {
+    1: (181, 182, 181, 220),  # #B5B6B5
+    2: (214, 154, 255, 220),  # #D69AFF
+    3: (255, 198, 41, 220),  # #FFC629
+    4: (82, 215, 197, 220)  # #52D7C5
+}
+
+
+# 仅用于测量文字宽度的共享画板, 避免每次测量都新建临时图像
+_measure_draw = ImageDraw.Draw(Image.new("RGBA", (1, 1)))
+
+
+def wrap_text(text, font, max_width):
+    """按最大宽度对文本进行自动换行"""
+    draw_tmp = _measure_draw
+    lines = []
+    current = ""
+    for ch in text:
+        test = current + ch
+        if ch == "\n":
+            lines.append(current)
+            current = ""
+        else:
+            try:
+                w = draw_tmp.textlength(test, font=font)
+            except:
+                ch = " "
+                test = current + ch
+                w = draw_tmp.textlength(test, font=font)
+            if w <= max_width:
+                current = test
+            else:
+                lines.append(current)
+                current = ch
+    if current:
+        lines.append(current)
+    return lines
+
+
+class LayoutEngine:
+    """布局引擎：只做测量, 把消息转换为显示列表, 不分配任何像素"""
+
+    def __init__(self, style, cache_size=128):
+        """
+        Args:
+            style: 提供字体与样式参数的 ChatBubbleGenerator
+            cache_size: 消息布局缓存的最大条目数
+        """
+        self.style = style
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        # 预加载线程、热键线程与后续页渲染线程会同时布局
+        self._cache_lock = threading.Lock()
+
+    def _textlength(self, text, font):
+        return _measure_draw.textlength(text, font=font)
+
+    # ------------------------------------------------------------------------------
+    # 图片在气泡中的尺寸(supersampling 倍率下的像素)
+    # ------------------------------------------------------------------------------
+    def _fit_image(self, image_size, max_width):
+        S = self.style.SCALE
+        w, h = int(image_size[0] * S * 0.8), int(image_size[1] * S * 0.8)
+        if w > max_width:
+            ratio = max_width / w
+            w, h = int(w * ratio), int(h * ratio)
+        radius = min(int(min(w, h) * 0.05), 50 * S)
+        return w, h, radius
+
+    # ------------------------------------------------------------------------------
+    # 聊天气泡布局（文字 / 图片 / 图片 + 文字）
+    # ------------------------------------------------------------------------------
+    def layout_bubble(self, text=None, image_size=None):
+        """
+        Args:
+            text: 气泡文字
+            image_size: 图片原始尺寸 (w, h), 没有图片时为 None
+
+        Returns:
+            dict: 位于 (0, 0) 的气泡图层
+        """
+        style = self.style
+        S = style.SCALE
+
+        if not text:
+            # 纯图片气泡
+            w, h, radius = self._fit_image(image_size, style.max_width * S)
+            items = [{
+                "op": "image",
+                "source": "image",
+                "box": [-10 / S, 0, (w - 10) / S, h / S],
+                "clip": [0, 0, w / S, h / S],
+                "radius": radius / S
+            }]
+            return {"box": [0, 0, w / S, h / S], "supersample": True, "items": items}
+
+        font = style.get_font("bubble", style.bubble_font_size * S)
+        padding = style.bubble_padding * S
+        max_width = style.max_width * S
+
+        lines = wrap_text(text, font, max_width - padding * 2)
+        # 保留原 bbox 行高算法
+        bbox = font.getbbox("字")
+        line_height = int(bbox[3] - bbox[1] + 4 * S)
+        text_height = line_height * len(lines)
+        text_width = max(self._textlength(line, font) for line in lines)
+        height = text_height + padding * (2 + len(lines))
+
+        image_item = None
+        if image_size is not None:
+            w, h, radius = self._fit_image(image_size, max_width - 2 * padding)
+            # 气泡宽度需同时容纳文字和图片
+            text_width = max(text_width, w)
+            top = text_height + padding * (2 + len(lines) + 1)
+            image_item = {
+                "op": "image",
+                "source": "image",
+                "box": [(padding - 10) / S, top / S, (padding - 10 + w) / S, (top + h) / S],
+                "clip": [padding / S, top / S, (padding + w) / S, (top + h) / S],
+                "radius": radius / S
+            }
+            height += h + padding
+        width = int(text_width + padding * 2)
+
+        items = [{
+            "op": "rounded_rect",
+            "box": [0, 0, width / S, height / S],
+            "radius": style.corner_radius,
+            "fill": list(style.bubble_bg_color),
+            "outline": [230, 230, 230, 255],
+            "width": 2
+        }]
+        y = padding
+        for line in lines:
+            items.append({
+                "op": "text",
+                "xy": [padding / S, y / S],
+                "text": line,
+                "font": "bubble",
+                "size": style.bubble_font_size,
+                "fill": list(style.text_color)
+            })
+            y += line_height + padding
+        if image_item is not None:
+            items.append(image_item)
+        return {"box": [0, 0, width / S, height / S], "supersample": True, "items": items}
+
+    # ------------------------------------------------------------------------------
+    # 长消息分页
+    # ------------------------------------------------------------------------------
+    def paginate(self, text, image_size=None, max_height=None):
+        """
+        按行把长消息拆分为多个连续气泡, 每个气泡高度不超过 max_height
+
+        Args:
+            text: 消息文字
+            image_size: 图片原始尺寸, 没有图片时为 None
+            max_height: 单个气泡的最大高度(逻辑像素), None 表示不分页
+
+        Returns:
+            List[Tuple[Optional[str], Optional[Tuple[int, int]]]]: 每页的 (文字, 图片尺寸)
+        """
+        if not text or max_height is None:
+            return [(text, image_size)]
+
+        style = self.style
+        S = style.SCALE
+        font = style.get_font("bubble", style.bubble_font_size * S)
+        padding = style.bubble_padding * S
+        max_width = style.max_width * S
+
+        lines = wrap_text(text, font, max_width - padding * 2)
+        bbox = font.getbbox("字")
+        line_height = int(bbox[3] - bbox[1] + 4 * S)
+        # 气泡高度 = 行数 * (行高 + 内边距) + 2 * 内边距
+        per_page = max(1, int((max_height * S - padding * 2) // (line_height + padding)))
+        pages = [
+            ("\n".join(lines[i:i + per_page]) or " ", None)
+            for i in range(0, len(lines), per_page)
+        ]
+
+        if image_size is not None:
+            # 图片跟随最后一页, 放不下时单独成页
+            _, h, _ = self._fit_image(image_size, max_width - padding * 2)
+            last_lines = len(lines) - per_page * (len(pages) - 1)
+            if last_lines * (line_height + padding) + padding * 2 + h + padding <= max_height * S:
+                pages[-1] = (pages[-1][0], image_size)
+            else:
+                pages.append((None, image_size))
+        return pages
+
+    # ------------------------------------------------------------------------------
+    # 头衔气泡布局
+    # ------------------------------------------------------------------------------
+    def layout_title(self, text, bg_color):
+        style = self.style
+        S = style.SCALE
+        font = style.get_font("title", style.title_font_size * S)
+
+        text_width = int(self._textlength(text, font))
+        bbox = font.getbbox(text)
+        text_height = int(bbox[3] - bbox[1] + 4 * S)
+        width = int(text_width + style.title_padding_x * 2)
+        height = int(text_height + style.title_padding_y * 3)
+
+        items = [
+            {
+                "op": "rounded_rect",
+                "box": [0, 0, width / S, height / S],
+                "radius": 8,
+                "fill": list(bg_color),
+                "outline": None,
+                "width": 0
+            },
+            {
+                "op": "text",
+                "xy": [style.title_padding_x / S, style.title_padding_y_offset / S],
+                "text": text,
+                "font": "title",
+                "size": style.title_font_size,
+                "fill": [255, 255, 255, 255]
+            }
+        ]
+        return {"box": [0, 0, width / S, height / S], "supersample": True, "items": items}
+
+    # ------------------------------------------------------------------------------
+    # 完整消息布局（头像 + 气泡 + 昵称 + 头衔）
+    # ------------------------------------------------------------------------------
+    def layout_message(
+        self,
+        info,
+        text,
+        image_size=None,
+        qq_title=None,
+        bubble_position=(120, 60),
+        avatar_position=(23, 10),
+        background_color="#F0F0F2"
+    ):
+        """
+        Args:
+            info: get_qq_info 返回的信息
+            text: 消息文字
+            image_size: 图片原始尺寸, 没有图片时为 None
+            qq_title: 头衔/备注信息 {"color", "content", "notes"}
+
+        Returns:
+            dict: 显示列表
+        """
+        key = (
+            info["name"], info["avatar_path"], text,
+            tuple(image_size) if image_size is not None else None,
+            tuple(sorted(qq_title.items())) if qq_title else None,
+            tuple(bubble_position), tuple(avatar_position), background_color
+        )
+        with self._cache_lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return cached
+
+        display_list = self._layout_message(
+            info, text, image_size, qq_title, bubble_position, avatar_position, background_color
+        )
+        with self._cache_lock:
+            self._cache[key] = display_list
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return display_list
+
+    def _layout_message(self, info, text, image_size, qq_title, bubble_position, avatar_position, background_color):
+        style = self.style
+        nickname = info["name"]
+        nickname_font = style.get_font("nickname", style.nickname_font_size)
+
+        # 气泡
+        bubble = self.layout_bubble(text, image_size)
+        bubble["box"][0], bubble["box"][1] = bubble_position
+        bubble_w, bubble_h = int(bubble["box"][2]), int(bubble["box"][3])
+
+        # 头衔: 只有备注(set_note 创建的记录)时只替换昵称, 不绘制头衔
+        title = None
+        name_x = bubble_position[0]
+        content = None
+        if qq_title is not None:
+            tmp_nickname = qq_title.get("notes", None)
+            content = qq_title.get("content", None)
+            if not tmp_nickname is None:
+                nickname = tmp_nickname
+        nickname_width = int(self._textlength(nickname, nickname_font)) + style.bubble_padding
+        if content:
+            title_color = qq_title.get("color", "1") or "1"
+            title_font = style.get_font("title", style.title_font_size)
+            title_width = int(self._textlength(content, title_font)) + style.bubble_padding
+            bg_w = max(
+                bubble_position[0] + bubble_w + style.margin,
+                avatar_position[0] + style.avatar_size[0] + style.margin,
+                bubble_position[0] + nickname_width + title_width + style.title_bubble_name_offset
+            )
+            title = self.layout_title(content, TITLE_COLOR_MAP.get(int(title_color), TITLE_COLOR_MAP[1]))
+            title["box"][0] = bubble_position[0]
+            title["box"][1] = avatar_position[1] + style.title_bubble_offset
+            name_x = bubble_position[0] + title_width + style.title_bubble_name_offset
+        else:
+            bg_w = max(
+                bubble_position[0] + bubble_w + style.margin,
+                avatar_position[0] + style.avatar_size[0] + style.margin,
+                bubble_position[0] + nickname_width
+            )
+
+        bg_h = max(
+            bubble_position[1] + bubble_h + style.margin,
+            avatar_position[1] + style.avatar_size[1] + style.margin
+        )
+
+        r = int(background_color[1:3], 16)
+        g = int(background_color[3:5], 16)
+        b = int(background_color[5:7], 16)
+
+        layers = [
+            bubble,
+            {
+                "box": [0, 0, bg_w, bg_h],
+                "supersample": False,
+                "items": [{
+                    "op": "avatar",
+                    "path": info["avatar_path"],
+                    "box": [
+                        avatar_position[0], avatar_position[1],
+                        avatar_position[0] + style.avatar_size[0], avatar_position[1] + style.avatar_size[1]
+                    ]
+                }]
+            }
+        ]
+        if title is not None:
+            layers.append(title)
+        layers.append({
+            "box": [0, 0, bg_w, bg_h],
+            "supersample": False,
+            "items": [{
+                "op": "text",
+                "xy": [name_x, avatar_position[1]],
+                "text": nickname,
+                "font": "nickname",
+                "size": style.nickname_font_size,
+                "fill": list(style.text_color)
+            }]
+        })
+
+        return {
+            "width": bg_w,
+            "height": bg_h,
+            "background": [r, g, b, 255],
+            "layers": layers
+        }
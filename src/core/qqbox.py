@@ -1,8 +1,64 @@
 from PIL import Image, ImageDraw, ImageFont
 from io import BytesIO
-import requests
+from src.core.layout import LayoutEngine
+from src.core.rasterizer import Rasterizer
+from src.core.glyph_atlas import GlyphAtlas
+from src.utils.http_utils import HttpClient, FetchError
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import hashlib
+import logging
+import time
 import os
 
+# 网络请求客户端(超时 + 重试 + 熔断), 可通过 set_http_client 替换
+http_client = HttpClient()
+
+# 负缓存: 查询失败的 qq -> (过期时间, 已获取到的昵称, 已下载的头像路径), 过期前不再发起网络请求
+NEGATIVE_CACHE_TTL = 300
+_negative_cache = {}
+_negative_cache_lock = threading.Lock()
+
+# 单次 get_qq_info 的网络请求(昵称 + 头像, 含重试)总时限(秒), 限制热键线程的最长等待
+QQ_INFO_DEADLINE = 5.0
+
+
+def set_http_client(client, negative_cache_ttl=None, deadline=None):
+    """替换模块使用的 HTTP 客户端"""
+    global http_client, NEGATIVE_CACHE_TTL, QQ_INFO_DEADLINE
+    http_client = client
+    if negative_cache_ttl is not None:
+        NEGATIVE_CACHE_TTL = negative_cache_ttl
+    if deadline is not None:
+        QQ_INFO_DEADLINE = deadline
+
+
+def _get_negative_cache(qq):
+    """命中时返回失败时已获取到的 (昵称, 头像路径), 未命中返回 None"""
+    with _negative_cache_lock:
+        entry = _negative_cache.get(str(qq))
+        if entry is None:
+            return None
+        expire, nickname, avatar_path = entry
+        if expire < time.monotonic():
+            del _negative_cache[str(qq)]
+            return None
+        return nickname, avatar_path
+
+
+def _add_negative_cache(qq, nickname=None, avatar_path=None):
+    with _negative_cache_lock:
+        _negative_cache[str(qq)] = (
+            time.monotonic() + NEGATIVE_CACHE_TTL,
+            str(nickname) if nickname is not None else str(qq),
+            avatar_path
+        )
+
+
+def clear_negative_cache():
+    with _negative_cache_lock:
+        _negative_cache.clear()
+
 # ------------------------------------------------------------------------------
 # 获取 QQ 信息（缓存 + API）
 # ------------------------------------------------------------------------------
@@ -21,24 +77,65 @@ def get_qq_info(qq):
                 "avatar_path": os.path.join(avatar_cache, filename)
             }
 
+    # 最近失败过的 qq 直接使用当时的结果(昵称失败时为 qq 号, 头像失败时为占位头像), 不再请求
+    cached = _get_negative_cache(qq)
+    if cached is not None:
+        cached_nickname, cached_avatar = cached
+        if cached_avatar is not None and os.path.exists(cached_avatar):
+            return {
+                "qq": qq,
+                "name": cached_nickname,
+                "avatar_path": cached_avatar,
+                "placeholder_name": True
+            }
+        return _placeholder_info(qq, avatar_cache, cached_nickname)
+
     # 请求 API
     # url = f"https://uapis.cn/api/v1/social/qq/userinfo?qq={qq}"
     url = f"http://api.mmp.cc/api/qqname?qq={qq}"
-    res = requests.get(url)
-    if res.status_code != 200:
-        nickname = qq
-    else:
-        data = res.json()
+    # 昵称与头像共用一个总时限, 网络不通时不会依次耗尽两个上游各自的超时与重试
+    deadline = time.monotonic() + QQ_INFO_DEADLINE
+    try:
+        res = http_client.get(url, deadline=deadline)
+    except FetchError as e:
+        # 昵称接口与头像接口是不同的上游, 昵称获取失败时仍然尝试下载头像
+        logging.warning(f"获取 QQ: {qq} 的昵称失败: {e}")
+        res = None
+    nickname = None
+    if res is not None and res.status_code == 200:
         try:
+            data = res.json()
             nickname = data["data"]["name"]
         except:
-            nickname = qq
+            nickname = None
     # avatar_url = data.get("avatar_url")
     avatar_url = f"https://q1.qlogo.cn/g?b=qq&nk={qq}&s=640"
     # avatar_url = f"http://q.qlogo.cn/headimg_dl?dst_uin={qq}&spec=640&img_type=png"
 
+    # 昵称获取失败时头像不能以 qq 号为昵称写入缓存, 否则之后一直命中错误的昵称;
+    # 先保存在不会被缓存命中的文件中, 负缓存过期后重新获取昵称
+    unnamed_path = os.path.join(avatar_cache, f".unnamed-{qq}.png")
+    if nickname is None:
+        if download_circular_avatar(avatar_url, unnamed_path, deadline=deadline) is None:
+            logging.warning(f"下载 QQ: {qq} 的头像失败, 使用占位头像")
+            _add_negative_cache(qq, qq)
+            return _placeholder_info(qq, avatar_cache, qq)
+        _add_negative_cache(qq, qq, unnamed_path)
+        return {
+            "qq": qq,
+            "name": str(qq),
+            "avatar_path": unnamed_path,
+            "placeholder_name": True
+        }
+
     save_path = os.path.join(avatar_cache, f"{qq}-{nickname}.png")
-    download_circular_avatar(avatar_url, save_path)
+    if os.path.exists(unnamed_path):
+        # 上次只下载到了头像, 补上昵称后直接改名
+        os.replace(unnamed_path, save_path)
+    elif download_circular_avatar(avatar_url, save_path, deadline=deadline) is None:
+        logging.warning(f"下载 QQ: {qq} 的头像失败, 使用占位头像")
+        _add_negative_cache(qq, nickname)
+        return _placeholder_info(qq, avatar_cache, nickname)
 
     return {
         "qq": qq,
@@ -46,6 +143,30 @@ def get_qq_info(qq):
         "avatar_path": save_path
     }
 
+def _placeholder_info(qq, avatar_cache, nickname=None):
+    """生成(或复用)占位头像并返回对应的 QQ 信息"""
+    # 文件名不以 "{qq}-" 开头, 不会被当作正式缓存命中
+    save_path = os.path.join(avatar_cache, f".placeholder-{qq}.png")
+    if not os.path.exists(save_path):
+        create_placeholder_avatar(qq).save(save_path)
+    return {
+        "qq": qq,
+        "name": nickname if nickname is not None else str(qq),
+        "avatar_path": save_path,
+        "placeholder": True
+    }
+
+def create_placeholder_avatar(qq, size=640):
+    """按 qq 号生成固定颜色的圆形占位头像"""
+    digest = hashlib.md5(str(qq).encode("utf-8")).digest()
+    color = (96 + digest[0] % 128, 96 + digest[1] % 128, 96 + digest[2] % 128, 255)
+    img = Image.new("RGBA", (size, size), color)
+    draw = ImageDraw.Draw(img)
+    # 简单的人像轮廓
+    draw.ellipse((size * 0.32, size * 0.18, size * 0.68, size * 0.54), fill=(255, 255, 255, 255))
+    draw.pieslice((size * 0.16, size * 0.58, size * 0.84, size * 1.26), 180, 360, fill=(255, 255, 255, 255))
+    return create_circular_avatar(img)
+
 def create_circular_avatar(img,size=None):
     # 中心裁剪正方形
     w, h = img.size
@@ -70,9 +191,9 @@ def create_circular_avatar(img,size=None):
 # ------------------------------------------------------------------------------
 # 下载头像并裁剪为圆形
 # ------------------------------------------------------------------------------
-def download_circular_avatar(url, save_path="avatar.png", size=None):
+def download_circular_avatar(url, save_path="avatar.png", size=None, deadline=None):
     try:
-        r = requests.get(url)
+        r = http_client.get(url, deadline=deadline)
         r.raise_for_status()
         img = Image.open(BytesIO(r.content)).convert("RGBA")
         result = create_circular_avatar(img)
@@ -85,6 +206,8 @@ def download_circular_avatar(url, save_path="avatar.png", size=None):
 # 兼容性函数：按比例缩放图像
 # ------------------------------------------------------------------------------
 def resize_by_scale(image, scale_factor):
+    if scale_factor == 1:
+        return image
     w, h = image.size
     return image.resize((int(w * scale_factor), int(h * scale_factor)), Image.Resampling.LANCZOS)
 
@@ -111,19 +234,32 @@ class ChatBubbleGenerator:
         avatar_size=(89, 89),
         margin=20,
         title_bubble_name_offset=-1,
-        max_width = 640
+        max_width = 640,
+        memory_budget=None,
+        glyph_cache_size=2048,
+        avatar_store=None,
+        output_scale=1.0,
+        render_threads=0
     ):
         self.SCALE = 4  # supersampling 倍率
 
-        # 气泡字体
-        self.bubble_font = ImageFont.truetype(bubble_font_path, bubble_font_size * self.SCALE)  if os.path.exists(bubble_font_path) else ImageFont.load_default()
+        # 输出倍率: 字号、内边距、圆角和坐标均按此倍率直接在目标分辨率下绘制(2.0 为 HiDPI, 0.5 为缩略图)
+        self.output_scale = output_scale
 
-        # 昵称字体
-        self.nickname_font = ImageFont.truetype(nickname_font_path, nickname_font_size)  if os.path.exists(nickname_font_path) else ImageFont.load_default()
+        # 单个气泡渲染时中间画布允许占用的内存上限(字节), None 表示不限制
+        self.memory_budget = memory_budget
+        # 最近一次渲染实际使用的倍率, 以及是否因内存预算而降级
+        # (诊断信息, 与 Rasterizer.last_* 相同, 多个线程同时渲染时会互相覆盖)
+        self.last_render_scale = self.SCALE
+        self.last_render_degraded = False
 
-        # 头衔字体
-        self.title_SCALE_font = ImageFont.truetype(title_font_path, title_font_size * self.SCALE)  if os.path.exists(nickname_font_path) else ImageFont.load_default()
-        self.title_font = ImageFont.truetype(title_font_path, title_font_size) if os.path.exists(nickname_font_path) else ImageFont.load_default()
+        # 字体(按角色和像素字号缓存)
+        self.font_paths = {
+            "bubble": bubble_font_path,
+            "nickname": nickname_font_path,
+            "title": title_font_path,
+        }
+        self._fonts = {}
 
         self.title_padding_x = title_padding_x
         self.title_padding_y = title_padding_y
@@ -141,250 +277,167 @@ class ChatBubbleGenerator:
         self.title_bubble_name_offset = title_bubble_name_offset
         self.max_width = max_width
 
+        # 气泡字体
+        self.bubble_font = self.get_font("bubble", bubble_font_size * self.SCALE)
+        # 昵称字体
+        self.nickname_font = self.get_font("nickname", nickname_font_size)
+        # 头衔字体
+        self.title_SCALE_font = self.get_font("title", title_font_size * self.SCALE)
+        self.title_font = self.get_font("title", title_font_size)
+
+        self.layout_engine = LayoutEngine(self)
+        # 字形图集缓存已光栅化的字形, glyph_cache_size 为 0 时关闭
+        self.glyph_atlas = GlyphAtlas(glyph_cache_size) if glyph_cache_size else None
+        # 打包头像库(AvatarStore), 为 None 时每次从 PNG 解码头像
+        self.avatar_store = avatar_store
+        self.rasterizer = Rasterizer(
+            self.get_font,
+            self.SCALE,
+            self.glyph_atlas,
+            avatar_store.get_or_create if avatar_store is not None else None
+        )
+        # 消息内并行渲染(气泡、头衔、头像)使用的共享线程池, render_threads 为 0 时按顺序渲染
+        self.render_executor = None
+        if render_threads > 0:
+            self.render_executor = ThreadPoolExecutor(max_workers=render_threads, thread_name_prefix="layer")
+
+    def get_font(self, role, size):
+        """按字体角色("bubble" / "nickname" / "title")和像素字号获取字体"""
+        font = self._fonts.get((role, size))
+        if font is None:
+            path = self.font_paths[role]
+            font = ImageFont.truetype(path, size) if os.path.exists(path) else ImageFont.load_default()
+            self._fonts[(role, size)] = font
+        return font
+
+    def _render_layer(self, layer, image=None):
+        ss = self.rasterizer.select_supersample(layer, self.output_scale, self.memory_budget)
+        self.last_render_scale = ss
+        self.last_render_degraded = ss != self.rasterizer.base_supersample(self.output_scale)
+        return self.rasterizer.render_layer(layer, {"image": image}, self.output_scale, ss)
+
+    def style_key(self):
+        """影响渲染结果的样式配置, 用于渲染缓存的键"""
+        return [
+            self.SCALE, self.font_paths, self.bubble_font_size, self.nickname_font_size, self.title_font_size,
+            self.bubble_padding, self.title_padding_x, self.title_padding_y, self.title_padding_y_offset,
+            self.title_bubble_offset, self.title_bubble_name_offset, self.bubble_bg_color, self.text_color,
+            self.corner_radius, self.avatar_size, self.margin, self.max_width, self.memory_budget,
+            self.output_scale
+        ]
+
+    def profile_version(self, qq, qq_title_key=None, info=None):
+        """qq 资料(昵称、头像文件、头衔/备注)的版本, 资料变化后随之变化; info 为 None 时通过 get_qq_info 获取"""
+        if info is None:
+            info = get_qq_info(qq)
+        try:
+            avatar_mtime = os.stat(info["avatar_path"]).st_mtime_ns
+        except OSError:
+            avatar_mtime = 0
+        return [
+            str(qq), info["name"], os.path.basename(info["avatar_path"]), avatar_mtime,
+            (qq_title_key or {}).get(qq, None)
+        ]
 
     # ------------------------------------------------------------------------------
     # 创建聊天气泡（高 DPI supersampling）
     # ------------------------------------------------------------------------------
     def create_chat_bubble(self, text):
-        SCALE = self.SCALE
-        font = self.bubble_font
-        padding = self.bubble_padding * SCALE
-        max_width = self.max_width * SCALE
-        tmp = Image.new("RGBA", (10, 10))
-        draw_tmp = ImageDraw.Draw(tmp)
-        lines = []
-        current = ""
-        for ch in text:
-            test = current + ch
-            if ch == "\n":
-                lines.append(current)
-                current = ""
-            else:
-                try:
-                    w = draw_tmp.textlength(test, font=font)
-                except:
-                    ch = " "
-                    test = current + ch
-                    w = draw_tmp.textlength(test, font=font)
-                if w <= max_width - padding * 2:
-                    current = test
-                else:
-                    lines.append(current)
-                    current = ch
-        if current:
-            lines.append(current)
-        # 保留原 bbox 行高算法
-        bbox = font.getbbox("字")
-        line_height = int(bbox[3] - bbox[1] + 4 * SCALE)
-        text_height = line_height * len(lines)
-        text_width = max(draw_tmp.textlength(line, font=font) for line in lines)
-        width = int(text_width + padding * 2)
-        height = text_height + padding * (2 + len(lines))
-        img = Image.new("RGBA", (width, height), (0, 0, 0, 0))
-        draw = ImageDraw.Draw(img)
-        draw.rounded_rectangle(
-            (0, 0, width, height),
-            radius=self.corner_radius * SCALE,
-            fill=self.bubble_bg_color,
-            outline=(230, 230, 230, 255),
-            width=2 * SCALE
-        )
-
-        y = padding
-        for line in lines:
-            draw.text((padding, y), line, fill=self.text_color, font=font)
-            y += line_height + padding
-
-        # 缩回正常尺寸实现高清
-        img = img.resize((width // SCALE, height // SCALE), Image.Resampling.LANCZOS)
-        return img
+        return self._render_layer(self.layout_engine.layout_bubble(text))
 
     # ------------------------------------------------------------------------------
     # 创建聊天气泡（图片）
     # ------------------------------------------------------------------------------
     def create_chat_img_bubble(self, image):
-        SCALE = self.SCALE
-        max_width = self.max_width * SCALE
         if isinstance(image, str):
-            img = Image.open(image)
-        else:
-            img = image
-        img = resize_by_scale(img, SCALE * 0.8)
-        orig_width, orig_height = img.size
-        if orig_width > max_width:
-            width_ratio = max_width / orig_width
-            new_width = int(orig_width * width_ratio)
-            new_height = int(orig_height * width_ratio)
-            img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-        else:
-            new_width, new_height = orig_width, orig_height
-        canvas_width = new_width
-        canvas_height = new_height
-        canvas = Image.new("RGBA", (canvas_width, canvas_height), (0, 0, 0, 0))
-        mask = Image.new("L", (new_width, new_height), 0)
-        draw_mask = ImageDraw.Draw(mask)
-        min_side = min(new_width, new_height)
-        radius_percentage = 0.05
-        dynamic_radius = int(min_side * radius_percentage)
-        max_radius = 50 * SCALE
-        final_radius = min(dynamic_radius, max_radius)
-        draw_mask.rounded_rectangle(
-            (0, 0, new_width, new_height),
-            radius=final_radius,
-            fill=255
-        )
-        canvas.paste(img, (-10, 0), mask)
-
-        # 缩回正常尺寸实现高清
-        if SCALE > 1:
-            canvas = canvas.resize(
-                (canvas_width // SCALE, canvas_height // SCALE),
-                Image.Resampling.LANCZOS
-            )
-
-        return canvas
+            image = Image.open(image)
+        return self._render_layer(self.layout_engine.layout_bubble(image_size=image.size), image)
 
     # ------------------------------------------------------------------------------
     # 创建聊天气泡（图片 + 文字）
     # ------------------------------------------------------------------------------
     def create_chat_text_img_bubble(self, text, image):
-        SCALE = self.SCALE
-        font = self.bubble_font
-        padding = self.bubble_padding * SCALE
-        max_width = self.max_width * SCALE
-
-        # 按比例缩放图片
-        image = resize_by_scale(image, SCALE * 0.8)
-        orig_width, orig_height = image.size
-        if orig_width > max_width - 2 * padding:
-            width_ratio = (max_width - 2 * padding) / orig_width
-            new_width = int(orig_width * width_ratio)
-            new_height = int(orig_height * width_ratio)
-            image = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-        else:
-            new_width, new_height = orig_width, orig_height
-        canvas_width = new_width
-        canvas_height = new_height
-        canvas = Image.new("RGBA", (canvas_width, canvas_height), (0, 0, 0, 0))
-        mask = Image.new("L", (new_width, new_height), 0)
-        draw_mask = ImageDraw.Draw(mask)
-        min_side = min(new_width, new_height)
-        radius_percentage = 0.05
-        dynamic_radius = int(min_side * radius_percentage)
-        max_radius = 50 * SCALE
-        final_radius = min(dynamic_radius, max_radius)
-        draw_mask.rounded_rectangle(
-            (0, 0, new_width, new_height),
-            radius=final_radius,
-            fill=255
-        )
-        canvas.paste(image, (-10, 0), mask)
-
-
-
-        tmp = Image.new("RGBA", (10, 10))
-        draw_tmp = ImageDraw.Draw(tmp)
-        lines = []
-        current = ""
-        for ch in text:
-            test = current + ch
-            if ch == "\n":
-                lines.append(current)
-                current = ""
-            else:
-                try:
-                    w = draw_tmp.textlength(test, font=font)
-                except:
-                    ch = " "
-                    test = current + ch
-                    w = draw_tmp.textlength(test, font=font)
-                if w <= max_width - padding * 2:
-                    current = test
-                else:
-                    lines.append(current)
-                    current = ch
-        if current:
-            lines.append(current)
-        # 保留原 bbox 行高算法
-        bbox = font.getbbox("字")
-        line_height = int(bbox[3] - bbox[1] + 4 * SCALE)
-        text_height = line_height * len(lines)
-        text_width = max(draw_tmp.textlength(line, font=font) for line in lines)
-        width = int(text_width + padding * 2)
-        height = text_height + padding * (2 + len(lines)) + canvas.height + padding
-        img = Image.new("RGBA", (width, height), (0, 0, 0, 0))
-        draw = ImageDraw.Draw(img)
-        draw.rounded_rectangle(
-            (0, 0, width, height),
-            radius=self.corner_radius * SCALE,
-            fill=self.bubble_bg_color,
-            outline=(230, 230, 230, 255),
-            width=2 * SCALE
-        )
-
-        y = padding
-        for line in lines:
-            draw.text((padding, y), line, fill=self.text_color, font=font)
-            y += line_height + padding
-        img.paste(
-            canvas,
-            (
-                padding,
-                text_height + padding * (2 + len(lines) + 1),
-                padding + new_width,
-                text_height + padding * (2 + len(lines) + 1) + new_height
-            ),
-            canvas
-        )
-
-        # 缩回正常尺寸实现高清
-        img = img.resize((width // SCALE, height // SCALE), Image.Resampling.LANCZOS)
-        return img
-
+        return self._render_layer(self.layout_engine.layout_bubble(text, image.size), image)
 
     # ------------------------------------------------------------------------------
     # 添加创建头衔气泡的方法
     # ------------------------------------------------------------------------------
     def create_title_bubble(self, text, bg_color):
         """创建头衔气泡（与昵称气泡样式相同）"""
-        SCALE = self.SCALE
-        font = self.title_SCALE_font
-
-        # 测量文本
-        tmp = Image.new("RGBA", (10, 10))
-        draw_tmp = ImageDraw.Draw(tmp)
-        text_width = int(draw_tmp.textlength(text, font=font))
-
-        # 获取字体高度
-        bbox = font.getbbox(text)
-        text_height = int(bbox[3] - bbox[1] + 4 * SCALE)
-
-        # 添加内边距
-        width = int(text_width + self.title_padding_x * 2)
-        height = int(text_height + self.title_padding_y * 3)
-
-        # 创建头衔气泡
-        img = Image.new("RGBA", (width, height), (0, 0, 0, 0))
-        draw = ImageDraw.Draw(img)
-
-        # 绘制圆角矩形背景
-        draw.rounded_rectangle(
-            (0, 0, width, height),
-            radius=8 * SCALE,
-            fill=bg_color
+        return self._render_layer(self.layout_engine.layout_title(text, bg_color))
+
+    # ------------------------------------------------------------------------------
+    # 布局与光栅化
+    # ------------------------------------------------------------------------------
+    def layout_message(
+        self,
+        qq,
+        text,
+        image=None,
+        qq_title_key=None,
+        bubble_position=(120, 60),
+        avatar_position=(23, 10),
+        background_color="#F0F0F2",
+        info=None
+    ):
+        """
+        只做测量, 返回消息的显示列表(不进行光栅化)
+
+        Args:
+            image: PIL 图片或图片尺寸 (w, h), 没有图片时为 None
+            info: 已获取的 qq 信息, 为 None 时通过 get_qq_info 获取
+        """
+        if info is None:
+            info = get_qq_info(qq)
+        assert info is not None, f"无法获取 QQ: {qq} 的信息"
+
+        if isinstance(image, str):
+            image = Image.open(image)
+        image_size = image.size if isinstance(image, Image.Image) else image
+        qq_title = (qq_title_key or {}).get(qq, None)
+        return self.layout_engine.layout_message(
+            info, text, image_size, qq_title, bubble_position, avatar_position, background_color
         )
 
-        # 绘制头衔文字（白色文字）
-        draw.text(
-            (self.title_padding_x, self.title_padding_y_offset),
-            text,
-            fill=(255, 255, 255, 255),
-            font=font
+    def measure_message(self, qq, text, image=None, qq_title_key=None, **kwargs):
+        """返回消息最终图片的尺寸 (w, h), 不进行光栅化"""
+        display_list = self.layout_message(qq, text, image, qq_title_key, **kwargs)
+        return (
+            int(display_list["width"] * self.output_scale),
+            int(display_list["height"] * self.output_scale)
         )
 
-        # 缩回正常尺寸
-        img = img.resize((width // SCALE, height // SCALE), Image.Resampling.LANCZOS)
-        return img
+    def render_display_list(self, display_list, image=None, scale=None):
+        """按给定倍率光栅化显示列表, scale 为 None 时使用 output_scale"""
+        if scale is None:
+            scale = self.output_scale
+        result = self.rasterizer.render(
+            display_list, {"image": image}, scale, self.memory_budget, self.render_executor
+        )
+        self.last_render_scale = self.rasterizer.last_supersample
+        self.last_render_degraded = self.rasterizer.last_degraded
+        return result
+
+    def layout_pages(self, qq, text, image=None, qq_title_key=None, max_height=None, **kwargs):
+        """
+        把长消息按行拆分为多条连续消息并分别布局
+
+        Args:
+            max_height: 单个气泡的最大高度, None 表示不分页
+            kwargs: 传给 layout_message 的其余参数(如 info)
+
+        Returns:
+            List[Tuple[dict, Optional[Image]]]: 每页的 (显示列表, 该页使用的图片)
+        """
+        if isinstance(image, str):
+            image = Image.open(image)
+        image_size = image.size if image is not None else None
+        pages = []
+        for page_text, page_image_size in self.layout_engine.paginate(text, image_size, max_height):
+            page_image = image if page_image_size is not None else None
+            display_list = self.layout_message(qq, page_text, page_image, qq_title_key, **kwargs)
+            pages.append((display_list, page_image))
+        return pages
 
     # ------------------------------------------------------------------------------
     # 创建完整聊天消息（头像 + 气泡 + 昵称）
@@ -399,94 +452,9 @@ class ChatBubbleGenerator:
         avatar_position=(23, 10),
         background_color="#F0F0F2"
     ):
-        info = get_qq_info(qq)
-        assert info is not None, f"无法获取 QQ: {qq} 的信息"
-
-        nickname = info["name"]
-        avatar_path = info["avatar_path"]
-
-        # 气泡
-        if text and (image is None):
-            bubble = self.create_chat_bubble(text)
-        else:
-            bubble = self.create_chat_img_bubble(image)
-        bubble_w, bubble_h = bubble.size
-
-        # 昵称宽度（正常尺寸）
-        tmp = Image.new("RGBA", (10, 10))
-        draw_tmp = ImageDraw.Draw(tmp)
-
-        # 头衔
-        qq_title = qq_title_key.get(qq, None)
-        is_title = not qq_title is None
-        if is_title:
-            tmp_nickname = qq_title.get("notes", None)
-            content = qq_title.get("content", "")
-            title_color = qq_title.get("color", "1")
-            if not tmp_nickname is None:
-                nickname = tmp_nickname
-            nickname_width = int(draw_tmp.textlength(nickname, font=self.nickname_font)) + self.bubble_padding
-            title_width = int(draw_tmp.textlength(content, font=self.title_font)) + self.bubble_padding
-            bg_w = max(
-                bubble_position[0] + bubble_w + self.margin,
-                avatar_position[0] + self.avatar_size[0] + self.margin,
-                bubble_position[0] + nickname_width + title_width + self.title_bubble_name_offset
-            )
-        else:
-            nickname_width = int(draw_tmp.textlength(nickname, font=self.nickname_font)) + self.bubble_padding
-            # 背景尺寸
-            bg_w = max(
-                bubble_position[0] + bubble_w + self.margin,
-                avatar_position[0] + self.avatar_size[0] + self.margin,
-                bubble_position[0] + nickname_width
-            )
-
-        # 背景尺寸
-        bg_h = max(
-            bubble_position[1] + bubble_h + self.margin,
-            avatar_position[1] + self.avatar_size[1] + self.margin
+        if isinstance(image, str):
+            image = Image.open(image)
+        display_list = self.layout_message(
+            qq, text, image, qq_title_key, bubble_position, avatar_position, background_color
         )
-
-        # 背景
-        r = int(background_color[1:3], 16)
-        g = int(background_color[3:5], 16)
-        b = int(background_color[5:7], 16)
-        background = Image.new("RGBA", (bg_w, bg_h), (r, g, b, 255))
-
-        # 贴气泡
-        background.paste(bubble, bubble_position, bubble)
-
-        # 贴头像
-        avatar = Image.open(avatar_path).convert("RGBA")
-        avatar = avatar.resize(self.avatar_size, Image.Resampling.LANCZOS)
-        background.paste(avatar, avatar_position, avatar)
-
-        # 昵称
-        if is_title:
-            color_map = {
-                1: (181, 182, 181, 220),  # #B5B6B5
-                2: (214, 154, 255, 220),  # #D69AFF
-                3: (255, 198, 41, 220),  # #FFC629
-                4: (82, 215, 197, 220)  # #52D7C5
-            }
-            title_bg_color = color_map.get(int(title_color), color_map[1])
-            title_bubble = self.create_title_bubble(content, title_bg_color)
-            background.paste(title_bubble, (bubble_position[0], avatar_position[1] + self.title_bubble_offset),
-                             title_bubble)
-            draw = ImageDraw.Draw(background)
-            draw.text(
-                (bubble_position[0] + title_width + self.title_bubble_name_offset, avatar_position[1]),
-                nickname,
-                fill=self.text_color,
-                font=self.nickname_font
-            )
-        else:
-            # 昵称
-            draw = ImageDraw.Draw(background)
-            draw.text(
-                (bubble_position[0], avatar_position[1]),
-                nickname,
-                fill=self.text_color,
-                font=self.nickname_font
-            )
-        return background
+        return self.render_display_list(display_list, image)
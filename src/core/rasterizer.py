@@ -0,0 +1,471 @@
+from PIL import Image, ImageDraw
+import logging
+import math
+
+
+class Rasterizer:
+    """
+    光栅化器：把布局引擎生成的显示列表按任意倍率绘制为图像
+
+    输出画布只分配一次, 各图层直接绘制到各自的区域。需要 supersampling 的只有文字和圆角矩形,
+    图片直接从原图一次缩放到输出尺寸, 只有它的圆角遮罩按 supersampling 倍率绘制。
+    """
+
+    # 合并 supersampling 区域时允许多绘制的输出像素数: 小区域分开绘制省下的像素不值得多一张中间图像
+    REGION_MERGE_SLACK = 64 * 64
+    # LANCZOS 缩小时每侧用到的邻近输出像素数(a = 3)
+    LANCZOS_REACH = 3
+
+    def __init__(self, font_provider, supersample=4, glyph_atlas=None, avatar_provider=None):
+        """
+        Args:
+            font_provider: 按 (字体角色, 像素字号) 返回字体的函数
+            supersample: 需要抗锯齿的图层使用的 supersampling 倍率
+            glyph_atlas: 字形图集, 为 None 时使用 ImageDraw.text 逐行绘制
+            avatar_provider: 按 (头像路径, 像素尺寸) 返回已缩放 RGBA 头像的函数, 为 None 时每次解码源文件
+        """
+        self.font_provider = font_provider
+        self.avatar_provider = avatar_provider
+        self.supersample = supersample
+        self.glyph_atlas = glyph_atlas
+        # 以下为诊断信息, 只反映最近一次渲染, 不是线程安全的: 多个线程同时渲染时会互相覆盖,
+        # 只应在单线程的测量与测试中读取
+        # 最近一次渲染实际使用的最小倍率, 以及是否因内存预算而降级
+        self.last_supersample = supersample
+        self.last_degraded = False
+        # 最近一次渲染分配的图像 [(用途, 模式, (w, h)), ...]
+        self.last_allocations = []
+
+    def _track(self, img, purpose):
+        self.last_allocations.append((purpose, img.mode, img.size))
+        return img
+
+    # ------------------------------------------------------------------------------
+    # 内存预算：估算图层画布大小并选择倍率
+    # ------------------------------------------------------------------------------
+    def estimate_layer_bytes(self, layer, scale=1.0):
+        """
+        估算图层渲染时中间画布的内存占用
+
+        Returns:
+            Tuple[float, float]: (随倍率变化的部分, 固定部分), 输出倍率为 scale 时的字节数;
+            supersampling 倍率为 ss 时总占用约为 前者 * ss² + 后者
+        """
+        w, h = layer["box"][2], layer["box"][3]
+        scaled = fixed = 0.0
+        vector_items = [item for item in layer["items"] if item["op"] != "image"]
+        if vector_items:
+            # 输出尺寸的图层(RGBA) + 各 supersampling 区域(含 LANCZOS 扩展)的画布、缩回与裁剪后的区域(RGBA)
+            size = (int(w * scale), int(h * scale))
+            fixed += size[0] * size[1] * 4
+            for region in self._supersample_regions(vector_items, w, h, scale):
+                x0, y0, x1, y1 = self._pad_region(region, size)
+                scaled += (x1 - x0) * (y1 - y0) * 4
+                fixed += (x1 - x0) * (y1 - y0) * 4 + (region[2] - region[0]) * (region[3] - region[1]) * 4
+        for item in layer["items"]:
+            if item["op"] == "image":
+                x0, y0, x1, y1 = item["box"]
+                area = (x1 - x0) * (y1 - y0) * scale * scale
+                # 缩放后的图片(RGBA)与遮罩(L)为输出尺寸, 只有遮罩的四个圆角按倍率绘制
+                corner = (math.ceil(item["radius"] * scale) + 1) * 2
+                scaled += corner * corner
+                fixed += area * 6 + corner * corner
+        return scaled, fixed
+
+    def base_supersample(self, scale=1.0):
+        """
+        输出倍率下的默认 supersampling 倍率
+
+        输出倍率大于 1 时相应降低, 使每个逻辑像素的绘制开销与 1 倍输出时相同
+        """
+        if scale <= 1:
+            return self.supersample
+        return max(1, math.ceil(self.supersample / scale))
+
+    def select_supersample(self, layer, scale=1.0, memory_budget=None):
+        """根据内存预算选择图层的 supersampling 倍率"""
+        base = self.base_supersample(scale) if layer["supersample"] else 1
+        ss = base
+        if memory_budget is None or ss == 1:
+            return ss
+        scaled, fixed = self.estimate_layer_bytes(layer, scale)
+        while ss > 1 and scaled * ss * ss + fixed > memory_budget:
+            ss -= 1
+        if ss != base:
+            logging.warning(
+                f"图层预计占用 {int(scaled * base ** 2 + fixed)} 字节, 超出内存预算 {memory_budget}, "
+                f"倍率由 {base} 降为 {ss}"
+            )
+        if scaled * ss * ss + fixed > memory_budget:
+            logging.warning(f"即使倍率为 1 仍超出内存预算 {memory_budget}")
+        return ss
+
+    # ------------------------------------------------------------------------------
+    # 绘制图元
+    # ------------------------------------------------------------------------------
+    def load_avatar(self, path, size):
+        """读取头像并缩放到 size 像素"""
+        if self.avatar_provider is not None:
+            return self.avatar_provider(path, size)
+        avatar = self._track(Image.open(path).convert("RGBA"), "avatar_decode")
+        return self._track(avatar.resize(size, Image.Resampling.LANCZOS), "avatar_resize")
+
+    def draw_items(self, canvas, items, k, offset=(0, 0), images=None, mask_supersample=1, prepared=None):
+        """
+        在画布上绘制图元
+
+        Args:
+            canvas: 目标画布
+            items: 图元列表(逻辑像素坐标)
+            k: 逻辑像素到画布像素的倍率
+            offset: 图元坐标原点在画布上的位置(画布像素)
+            mask_supersample: 图片圆角遮罩的 supersampling 倍率
+            prepared: 已在线程池中准备好的图片/头像 {id(图元): Future}
+        """
+        ox, oy = offset
+        draw = ImageDraw.Draw(canvas)
+        for item in items:
+            op = item["op"]
+            if op == "rounded_rect":
+                x0, y0, x1, y1 = item["box"]
+                kwargs = {}
+                if item.get("outline"):
+                    kwargs = {"outline": tuple(item["outline"]), "width": int(item["width"] * k)}
+                draw.rounded_rectangle(
+                    (ox + x0 * k, oy + y0 * k, ox + x1 * k, oy + y1 * k),
+                    radius=item["radius"] * k,
+                    fill=tuple(item["fill"]),
+                    **kwargs
+                )
+            elif op == "text":
+                x, y = item["xy"]
+                size = round(item["size"] * k)
+                font = self.font_provider(item["font"], size)
+                if self.glyph_atlas is not None:
+                    self.glyph_atlas.draw_text(
+                        canvas, (ox + x * k, oy + y * k), item["text"], font, (item["font"], size), tuple(item["fill"])
+                    )
+                else:
+                    draw.text((ox + x * k, oy + y * k), item["text"], fill=tuple(item["fill"]), font=font)
+            elif op == "image":
+                if prepared is not None and id(item) in prepared:
+                    result = prepared[id(item)].result()
+                else:
+                    result = self._prepare_image(item, images[item["source"]], k, offset, mask_supersample)
+                if result is not None:
+                    img, mask, position = result
+                    canvas.paste(img, position, mask)
+            elif op == "avatar":
+                x0, y0, x1, y1 = item["box"]
+                size = (round((x1 - x0) * k), round((y1 - y0) * k))
+                if prepared is not None and id(item) in prepared:
+                    avatar = prepared[id(item)].result()
+                else:
+                    avatar = self.load_avatar(item["path"], size)
+                canvas.paste(avatar, (round(ox + x0 * k), round(oy + y0 * k)), avatar)
+            else:
+                raise ValueError(f"未知图元类型: {op}")
+
+    def _prepare_image(self, item, source, k, offset, mask_supersample=1):
+        """
+        缩放图片并生成圆角遮罩, 图片裁剪到 clip 区域内
+
+        Returns:
+            Optional[Tuple[Image, Image, Tuple[int, int]]]: (缩放后的图片, 遮罩, 画布上的位置), 完全不可见时为 None
+        """
+        ox, oy = offset
+        x0, y0, x1, y1 = item["box"]
+        left, top = round(ox + x0 * k), round(oy + y0 * k)
+        width, height = round((x1 - x0) * k), round((y1 - y0) * k)
+        if width <= 0 or height <= 0:
+            return None
+
+        # 与裁剪区域求交
+        cx0, cy0, cx1, cy1 = item["clip"]
+        cx0, cy0 = max(left, round(ox + cx0 * k)), max(top, round(oy + cy0 * k))
+        cx1, cy1 = min(left + width, round(ox + cx1 * k)), min(top + height, round(oy + cy1 * k))
+        if cx0 >= cx1 or cy0 >= cy1:
+            return None
+        crop = (cx0 - left, cy0 - top, cx1 - left, cy1 - top)
+
+        # 原图一次缩放到输出尺寸, 只缩放会显示出来的部分
+        sx, sy = source.width / width, source.height / height
+        img = self._track(source.resize(
+            (crop[2] - crop[0], crop[3] - crop[1]),
+            Image.Resampling.LANCZOS,
+            box=(crop[0] * sx, crop[1] * sy, crop[2] * sx, crop[3] * sy)
+        ), "image_resize")
+
+        # 圆角遮罩: 只有四个圆角按 supersampling 倍率绘制后缩回, 其余部分直接在输出尺寸下绘制
+        ss = mask_supersample
+        radius = int(item["radius"] * k * ss)
+        mask = self._track(Image.new("L", (width, height), 0), "image_mask")
+        ImageDraw.Draw(mask).rounded_rectangle((0, 0, width, height), radius=radius // ss, fill=255)
+        corner = min(math.ceil(radius / ss) + 1, width // 2, height // 2)
+        if ss > 1 and corner > 0:
+            # 边长为两倍圆角的圆角矩形, 四个象限恰好是四个圆角
+            tile = self._track(Image.new("L", (corner * 2 * ss, corner * 2 * ss), 0), "image_mask_corner")
+            ImageDraw.Draw(tile).rounded_rectangle(
+                (0, 0, corner * 2 * ss, corner * 2 * ss), radius=radius, fill=255
+            )
+            tile = self._track(tile.reduce(ss), "image_mask_corner_reduce")
+            for qx, qy, dx, dy in (
+                    (0, 0, 0, 0),
+                    (corner, 0, width - corner, 0),
+                    (0, corner, 0, height - corner),
+                    (corner, corner, width - corner, height - corner)
+            ):
+                mask.paste(tile.crop((qx, qy, qx + corner, qy + corner)), (dx, dy))
+        if crop != (0, 0, width, height):
+            mask = self._track(mask.crop(crop), "image_mask_crop")
+        return img, mask, (cx0, cy0)
+
+    # ------------------------------------------------------------------------------
+    # 渲染单个图层 / 完整显示列表
+    # ------------------------------------------------------------------------------
+    def _supersample_regions(self, items, w, h, scale):
+        """
+        图层中需要抗锯齿的区域(输出像素坐标): 圆角矩形的四条边框带(圆角与描边), 以及文字行所在的矩形
+
+        圆角矩形内部是纯色, 直接在输出尺寸下绘制即可; 对图文气泡而言图片区域不再参与 supersampling。
+
+        Returns:
+            List[Tuple[int, int, int, int]]: 区域 (x0, y0, x1, y1), 可能互相重叠
+        """
+        width, height = int(w * scale), int(h * scale)
+        regions = []
+        text_box = None
+        for item in items:
+            if item["op"] == "rounded_rect":
+                x0, y0, x1, y1 = item["box"]
+                x0, y0 = math.floor(x0 * scale), math.floor(y0 * scale)
+                x1, y1 = math.ceil(x1 * scale), math.ceil(y1 * scale)
+                band = math.ceil(max(item["radius"], item.get("width") or 0) * scale) + 1
+                regions += [
+                    (x0, y0, x1, y0 + band),
+                    (x0, y1 - band, x1, y1),
+                    (x0, y0 + band, x0 + band, y1 - band),
+                    (x1 - band, y0 + band, x1, y1 - band),
+                ]
+            elif item["op"] == "text":
+                x, y = item["xy"]
+                font = self.font_provider(item["font"], max(1, round(item["size"] * scale)))
+                left, top, right, bottom = font.getbbox(item["text"])
+                # 不同字号下字形边界略有差异, 留出余量
+                pad = max(2, math.ceil(scale))
+                box = (
+                    math.floor(x * scale + left) - pad, math.floor(y * scale + top) - pad,
+                    math.ceil(x * scale + right) + pad, math.ceil(y * scale + bottom) + pad
+                )
+                if text_box is None:
+                    text_box = box
+                else:
+                    text_box = (
+                        min(text_box[0], box[0]), min(text_box[1], box[1]),
+                        max(text_box[2], box[2]), max(text_box[3], box[3])
+                    )
+        if text_box is not None:
+            regions.append(text_box)
+
+        clipped = []
+        for x0, y0, x1, y1 in regions:
+            x0, y0, x1, y1 = max(0, x0), max(0, y0), min(width, x1), min(height, y1)
+            if x0 < x1 and y0 < y1:
+                clipped.append((x0, y0, x1, y1))
+        return self._merge_regions(clipped)
+
+    def _merge_regions(self, regions):
+        """合并外接矩形不明显大于两者面积之和的区域(例如顶边框带与首行文字), 减少中间图像的数量"""
+        def area(r):
+            return (r[2] - r[0]) * (r[3] - r[1])
+
+        regions = list(regions)
+        merged = True
+        while merged:
+            merged = False
+            for i in range(len(regions)):
+                for j in range(i + 1, len(regions)):
+                    a, b = regions[i], regions[j]
+                    union = (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+                    if area(union) <= area(a) + area(b) + self.REGION_MERGE_SLACK:
+                        regions[i] = union
+                        del regions[j]
+                        merged = True
+                        break
+                if merged:
+                    break
+        return regions
+
+    def _pad_region(self, region, size):
+        """把区域向外扩展 LANCZOS 的作用范围(不超出图层), 缩回后裁掉扩展部分, 结果与整块缩放一致"""
+        x0, y0, x1, y1 = region
+        reach = self.LANCZOS_REACH
+        return max(0, x0 - reach), max(0, y0 - reach), min(size[0], x1 + reach), min(size[1], y1 + reach)
+
+    def _render_vector_tile(self, items, w, h, scale, supersample):
+        """
+        文字与圆角矩形: 先在输出尺寸下绘制圆角矩形, 再把需要抗锯齿的区域
+        按 supersampling 倍率重新绘制(包含区域内的全部图元)后用 LANCZOS 缩回并覆盖
+        """
+        size = (int(w * scale), int(h * scale))
+        # 图层尺寸向下取整, 圆角矩形收进图层内, 避免底边与右边的描边被截掉
+        items = [
+            dict(item, box=(
+                item["box"][0], item["box"][1],
+                min(item["box"][2], size[0] / scale), min(item["box"][3], size[1] / scale)
+            )) if item["op"] == "rounded_rect" else item
+            for item in items
+        ]
+        tile = self._track(Image.new("RGBA", size, (0, 0, 0, 0)), "layer")
+        if supersample == 1:
+            self.draw_items(tile, items, scale)
+            return tile
+
+        # 文字一定位于文字区域内, 不需要在输出尺寸下绘制
+        self.draw_items(tile, [item for item in items if item["op"] != "text"], scale)
+        k = scale * supersample
+        for x0, y0, x1, y1 in self._supersample_regions(items, w, h, scale):
+            px0, py0, px1, py1 = self._pad_region((x0, y0, x1, y1), size)
+            region = self._track(
+                Image.new("RGBA", ((px1 - px0) * supersample, (py1 - py0) * supersample), (0, 0, 0, 0)),
+                "supersample"
+            )
+            self.draw_items(region, items, k, (-px0 * supersample, -py0 * supersample))
+            region = self._track(region.resize((px1 - px0, py1 - py0), Image.Resampling.LANCZOS), "downsample")
+            if (px0, py0, px1, py1) != (x0, y0, x1, y1):
+                region = self._track(region.crop((x0 - px0, y0 - py0, x1 - px0, y1 - py0)), "downsample_crop")
+            tile.paste(region, (x0, y0))
+        return tile
+
+    def _composite_layer(self, canvas, layer, images, scale, supersample, prepared=None):
+        """
+        把图层绘制到画布上对应的区域, canvas 为 None 时新建透明画布
+
+        Args:
+            prepared: 已在线程池中准备好的部分 {id(图层或图元): Future}
+
+        Returns:
+            Image: 目标画布
+        """
+        x, y = layer["box"][0], layer["box"][1]
+        w, h = layer["box"][2], layer["box"][3]
+        origin = (int(x * scale), int(y * scale))
+        size = (int(w * scale), int(h * scale))
+
+        if not layer["supersample"]:
+            if canvas is None:
+                canvas = self._track(Image.new("RGBA", size, (0, 0, 0, 0)), "layer")
+                origin = (0, 0)
+            self.draw_items(canvas, layer["items"], scale, origin, images, prepared=prepared)
+            return canvas
+
+        vector_items = [item for item in layer["items"] if item["op"] != "image"]
+        image_items = [item for item in layer["items"] if item["op"] == "image"]
+
+        # 文字与圆角矩形: supersampling 后缩回
+        if vector_items:
+            if prepared is not None and id(layer) in prepared:
+                tile = prepared[id(layer)].result()
+            else:
+                tile = self._render_vector_tile(vector_items, w, h, scale, supersample)
+            if canvas is None:
+                canvas = tile
+                origin = (0, 0)
+            else:
+                canvas.paste(tile, origin, tile)
+        elif canvas is None:
+            canvas = self._track(Image.new("RGBA", size, (0, 0, 0, 0)), "layer")
+            origin = (0, 0)
+
+        # 图片: 直接绘制到输出尺寸
+        if image_items:
+            self.draw_items(canvas, image_items, scale, origin, images, supersample, prepared)
+        return canvas
+
+    def _submit_layer(self, executor, layer, images, scale, supersample):
+        """
+        把图层中互相独立、开销较大的部分提交到线程池
+
+        包括 supersampling 的文字/圆角矩形画布、图片缩放与遮罩、头像解码与缩放;
+        Pillow 在缩放和大部分绘制时会释放 GIL, 这些部分可以真正并行。
+
+        Returns:
+            dict: {id(图层或图元): Future}
+        """
+        prepared = {}
+        w, h = layer["box"][2], layer["box"][3]
+        origin = (int(layer["box"][0] * scale), int(layer["box"][1] * scale))
+        if layer["supersample"]:
+            vector_items = [item for item in layer["items"] if item["op"] != "image"]
+            if vector_items:
+                prepared[id(layer)] = executor.submit(
+                    self._render_vector_tile, vector_items, w, h, scale, supersample
+                )
+        for item in layer["items"]:
+            if item["op"] == "image" and layer["supersample"]:
+                prepared[id(item)] = executor.submit(
+                    self._prepare_image, item, images[item["source"]], scale, origin, supersample
+                )
+            elif item["op"] == "avatar":
+                x0, y0, x1, y1 = item["box"]
+                size = (round((x1 - x0) * scale), round((y1 - y0) * scale))
+                prepared[id(item)] = executor.submit(self.load_avatar, item["path"], size)
+        return prepared
+
+    def render_layer(self, layer, images=None, scale=1.0, supersample=None):
+        """
+        把图层渲染为独立的 RGBA 图像(尺寸为图层大小乘以 scale)
+
+        Args:
+            supersample: supersampling 倍率, 为 None 时按图层设置使用默认倍率
+        """
+        if supersample is None:
+            supersample = self.base_supersample(scale) if layer["supersample"] else 1
+        self.last_allocations = []
+        return self._composite_layer(None, layer, images, scale, supersample)
+
+    def render(self, display_list, images=None, scale=1.0, memory_budget=None, executor=None):
+        """
+        渲染完整显示列表
+
+        Args:
+            display_list: 布局引擎生成的显示列表
+            images: 图元引用的图片 {名称: PIL.Image}
+            scale: 输出倍率
+            memory_budget: 单个图层中间画布的内存上限(字节), None 表示不限制
+            executor: 线程池, 指定时气泡、头衔与头像先在线程池中并行准备, 再按图层顺序合成;
+                同时设置了 memory_budget 且各图层合计超出预算时逐层渲染
+        """
+        self.last_allocations = []
+        width = int(display_list["width"] * scale)
+        height = int(display_list["height"] * scale)
+        canvas = self._track(Image.new("RGBA", (width, height), tuple(display_list["background"])), "output")
+
+        self.last_supersample = self.base_supersample(scale)
+        self.last_degraded = False
+        plan = []
+        for layer in display_list["layers"]:
+            ss = self.select_supersample(layer, scale, memory_budget)
+            if layer["supersample"]:
+                self.last_degraded = self.last_degraded or ss != self.base_supersample(scale)
+                self.last_supersample = min(self.last_supersample, ss)
+            plan.append((layer, ss))
+
+        if executor is not None and memory_budget is not None:
+            # 并行准备时所有图层的中间画布同时存在, 总和超出预算时退回逐层渲染
+            total = 0
+            for layer, ss in plan:
+                scaled, fixed = self.estimate_layer_bytes(layer, scale)
+                total += scaled * ss * ss + fixed
+            if total > memory_budget:
+                logging.debug(f"各图层预计共占用 {int(total)} 字节, 超出内存预算 {memory_budget}, 逐层渲染")
+                executor = None
+
+        prepared = None
+        if executor is not None:
+            prepared = {}
+            for layer, ss in plan:
+                prepared.update(self._submit_layer(executor, layer, images, scale, ss))
+        for layer, ss in plan:
+            self._composite_layer(canvas, layer, images, scale, ss, prepared)
+        return canvas
@@ -0,0 +1,150 @@
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+from PIL import Image
+import threading
+import hashlib
+import logging
+import struct
+import json
+import os
+
+
+class RenderCache:
+    """
+    渲染结果的内容寻址磁盘缓存
+
+    以 (qq 资料版本, 文字, 图片摘要, 样式配置) 的哈希为键, 保存每一页最终的 PNG
+    以及可以直接写入剪贴板的 DIB 数据。重复发送相同消息时无需布局、光栅化和编码。
+    总大小超过上限时按最近使用时间淘汰。
+
+    每个条目是一个文件: 4 字节头部长度 + JSON 头部(各页 PNG/DIB 长度) + 数据。
+    """
+
+    SUFFIX = ".bin"
+
+    def __init__(self, directory: str, max_bytes: int = 64 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+        # 按修改时间从旧到新加载已有条目
+        files = []
+        for name in os.listdir(directory):
+            if name.endswith(self.SUFFIX):
+                st = os.stat(os.path.join(directory, name))
+                files.append((st.st_mtime, name, st.st_size))
+        for _, name, size in sorted(files):
+            self._entries[name[:-len(self.SUFFIX)]] = size
+            self._total_bytes += size
+
+    # ------------------------------------------------------------------------------
+    # 键
+    # ------------------------------------------------------------------------------
+    @staticmethod
+    def image_digest(image: Optional[Image.Image]) -> Optional[str]:
+        """图片内容摘要"""
+        if image is None:
+            return None
+        h = hashlib.sha1()
+        h.update(f"{image.mode}|{image.size}".encode("utf-8"))
+        h.update(image.tobytes())
+        return h.hexdigest()
+
+    @staticmethod
+    def make_key(*parts) -> str:
+        """由任意可 JSON 序列化的部分生成缓存键"""
+        data = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + self.SUFFIX)
+
+    # ------------------------------------------------------------------------------
+    # 读写
+    # ------------------------------------------------------------------------------
+    def get(self, key: str) -> Optional[List[Tuple[bytes, bytes]]]:
+        """
+        Returns:
+            每页的 (PNG 数据, DIB 数据), 未命中时返回 None
+        """
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+        try:
+            with open(self._path(key), "rb") as f:
+                header_len = struct.unpack("<I", f.read(4))[0]
+                header = json.loads(f.read(header_len).decode("utf-8"))
+                pages = [(f.read(png_len), f.read(dib_len)) for png_len, dib_len in header["pages"]]
+            os.utime(self._path(key))
+        except (OSError, ValueError, KeyError, struct.error) as e:
+            logging.warning(f"读取渲染缓存失败: {e}")
+            self._discard(key)
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return pages
+
+    def put(self, key: str, pages: List[Tuple[bytes, bytes]]):
+        """写入一条缓存, 并在超出容量时淘汰最久未使用的条目"""
+        header = json.dumps({"pages": [[len(png), len(dib)] for png, dib in pages]}).encode("utf-8")
+        tmp_path = f"{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(struct.pack("<I", len(header)))
+                f.write(header)
+                for png, dib in pages:
+                    f.write(png)
+                    f.write(dib)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            logging.warning(f"写入渲染缓存失败: {e}")
+            return
+        size = 4 + len(header) + sum(len(png) + len(dib) for png, dib in pages)
+        with self._lock:
+            self._total_bytes += size - self._entries.pop(key, 0)
+            self._entries[key] = size
+            evicted = []
+            while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+                old_key, old_size = self._entries.popitem(last=False)
+                self._total_bytes -= old_size
+                evicted.append(old_key)
+        for old_key in evicted:
+            try:
+                os.remove(self._path(old_key))
+            except OSError:
+                pass
+
+    def _discard(self, key: str):
+        with self._lock:
+            self._total_bytes -= self._entries.pop(key, 0)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    # ------------------------------------------------------------------------------
+    # 统计
+    # ------------------------------------------------------------------------------
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hit_rate, 4),
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+            }
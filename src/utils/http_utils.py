@@ -0,0 +1,119 @@
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+import threading
+import requests
+import logging
+import time
+
+
+class FetchError(Exception):
+    """请求上游失败（超时、连接错误、5xx 或熔断）"""
+
+
+class CircuitBreaker:
+    """简单熔断器：连续失败达到阈值后在冷却时间内直接拒绝请求"""
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """是否允许发起请求（冷却结束后放行一次试探请求）"""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                # 半开状态：放行本次请求，失败则重新计时
+                self._opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+    @property
+    def is_open(self) -> bool:
+        with self._lock:
+            return self._opened_at is not None
+
+
+class HttpClient:
+    """带超时、有限重试与按上游熔断的 HTTP 客户端"""
+
+    def __init__(
+            self,
+            connect_timeout: float = 2.0,
+            read_timeout: float = 3.0,
+            retries: int = 2,
+            backoff: float = 0.2,
+            failure_threshold: int = 3,
+            reset_timeout: float = 30.0
+    ):
+        self.timeout: Tuple[float, float] = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+        self._session = requests.Session()
+
+    def breaker_for(self, url: str) -> CircuitBreaker:
+        """获取上游主机对应的熔断器"""
+        host = urlparse(url).netloc
+        with self._lock:
+            breaker = self._breakers.get(host)
+            if breaker is None:
+                breaker = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+                self._breakers[host] = breaker
+            return breaker
+
+    def get(self, url: str, deadline: Optional[float] = None) -> requests.Response:
+        """
+        发起 GET 请求
+
+        4xx 响应会直接返回给调用方；超时、连接错误和 5xx 会按指数退避重试，
+        全部失败或熔断器打开时抛出 FetchError。
+
+        Args:
+            deadline: 总截止时间(time.monotonic()), 各次尝试的超时与退避等待都不会超过它,
+                到期后不再重试并抛出 FetchError; None 表示只受超时与重试次数限制
+        """
+        breaker = self.breaker_for(url)
+        last_error: Optional[Exception] = None
+        for attempt in range(self.retries + 1):
+            timeout = self.timeout
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise FetchError(f"请求 {url} 超出总时限: {last_error}")
+                timeout = (min(timeout[0], remaining), min(timeout[1], remaining))
+            if not breaker.allow():
+                raise FetchError(f"上游 {urlparse(url).netloc} 已熔断")
+            try:
+                res = self._session.get(url, timeout=timeout)
+                if res.status_code < 500:
+                    breaker.record_success()
+                    return res
+                last_error = FetchError(f"HTTP {res.status_code}")
+            except requests.RequestException as e:
+                last_error = e
+            breaker.record_failure()
+            logging.debug(f"请求 {url} 失败 (第 {attempt + 1} 次): {last_error}")
+            if attempt < self.retries:
+                delay = self.backoff * (2 ** attempt)
+                if deadline is not None:
+                    delay = min(delay, max(0.0, deadline - time.monotonic()))
+                time.sleep(delay)
+        raise FetchError(f"请求 {url} 失败: {last_error}")
@@ -1,15 +1,88 @@
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 import logging
+import atexit
+import queue
+import json
 import sys
 
-def setup_logger(level: str = "INFO"):
-    """设置日志配置"""
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """JSON-lines 日志格式，附带请求 ID 与阶段耗时"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "message": record.getMessage(),
+        }
+        for key in ("request_id", "timings"):
+            value = getattr(record, key, None)
+            if value is not None:
+                data[key] = value
+        return json.dumps(data, ensure_ascii=False)
+
+
+def _stop_listener():
+    """停止监听线程并关闭它持有的处理器(释放日志文件句柄)"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+def setup_logger(
+        level: str = "INFO",
+        log_file: str = "emoji_generator.log",
+        max_bytes: int = 5 * 1024 * 1024,
+        backup_count: int = 3,
+        json_format: bool = False
+):
+    """
+    设置日志配置
+
+    调用方只把日志记录放入队列，由后台 QueueListener 线程负责格式化和写盘，
+    热键回调线程不会被磁盘 I/O 阻塞。日志文件按大小轮转。
+
+    Args:
+        level: 日志等级
+        log_file: 日志文件路径
+        max_bytes: 单个日志文件的最大字节数
+        backup_count: 保留的历史日志文件数量
+        json_format: 是否使用 JSON-lines 格式输出
+    """
+    global _listener
     log_level = getattr(logging, level.upper(), logging.INFO)
 
-    logging.basicConfig(
-        level=log_level,
-        format="%(asctime)s [%(levelname)s] %(message)s",
-        handlers=[
-            logging.StreamHandler(sys.stdout),
-            logging.FileHandler('emoji_generator.log', encoding='utf-8')
-        ]
-    )
\ No newline at end of file
+    if json_format:
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter("%(asctime)s [%(levelname)s] %(message)s")
+
+    handlers = [
+        logging.StreamHandler(sys.stdout),
+        RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+    ]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    # 重复调用时先停止旧的监听线程并关闭旧的处理器
+    if _listener is None:
+        atexit.register(_stop_listener)
+    else:
+        _stop_listener()
+
+    log_queue = queue.SimpleQueue()
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+    root.addHandler(QueueHandler(log_queue))
+    root.setLevel(log_level)
+    return _listener
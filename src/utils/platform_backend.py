@@ -0,0 +1,268 @@
+from typing import Callable, List, Optional, Tuple
+from abc import ABC, abstractmethod
+import threading
+import logging
+import time
+
+
+class PlatformBackend(ABC):
+    """
+    平台后端：键盘、剪贴板与前台窗口操作的统一接口
+
+    ClipboardManager、SystemUtils 与主程序只通过当前后端访问系统,
+    Windows 下使用 WindowsBackend, 测量与回放时替换为 FakeBackend。
+    """
+
+    @abstractmethod
+    def send_hotkey(self, hotkey: str):
+        """模拟按下快捷键"""
+
+    @abstractmethod
+    def add_hotkey(self, hotkey: str, callback: Callable, suppress: bool = False):
+        """注册全局热键"""
+
+    @abstractmethod
+    def wait(self):
+        """阻塞直到程序退出"""
+
+    def sleep(self, seconds: float):
+        """等待目标程序处理按键"""
+        time.sleep(seconds)
+
+    @abstractmethod
+    def get_text(self) -> str:
+        """读取剪贴板文本"""
+
+    @abstractmethod
+    def set_text(self, text: str):
+        """写入剪贴板文本"""
+
+    @abstractmethod
+    def get_dib(self) -> Optional[bytes]:
+        """读取剪贴板中的 DIB 图像数据, 没有图像时返回 None"""
+
+    @abstractmethod
+    def set_dib(self, data: bytes):
+        """把 DIB 图像数据写入剪贴板"""
+
+    @abstractmethod
+    def get_foreground_process_name(self) -> Optional[str]:
+        """获取当前前台窗口的进程名称(小写)"""
+
+
+class WindowsBackend(PlatformBackend):
+    """基于 keyboard / pyperclip / pywin32 的 Windows 后端"""
+
+    def __init__(self):
+        import win32clipboard
+        import win32process
+        import win32gui
+        import pyperclip
+        import keyboard
+        import psutil
+        self._clipboard = win32clipboard
+        self._process = win32process
+        self._gui = win32gui
+        self._pyperclip = pyperclip
+        self._keyboard = keyboard
+        self._psutil = psutil
+
+    def send_hotkey(self, hotkey: str):
+        self._keyboard.send(hotkey)
+
+    def add_hotkey(self, hotkey: str, callback: Callable, suppress: bool = False):
+        self._keyboard.add_hotkey(hotkey, callback, suppress=suppress)
+
+    def wait(self):
+        self._keyboard.wait()
+
+    def get_text(self) -> str:
+        return self._pyperclip.paste()
+
+    def set_text(self, text: str):
+        self._pyperclip.copy(text)
+
+    def get_dib(self) -> Optional[bytes]:
+        self._clipboard.OpenClipboard()
+        try:
+            # 检查剪贴板中是否有图像
+            if not self._clipboard.IsClipboardFormatAvailable(self._clipboard.CF_DIB):
+                return None
+            return self._clipboard.GetClipboardData(self._clipboard.CF_DIB) or None
+        finally:
+            try:
+                self._clipboard.CloseClipboard()
+            except Exception:
+                pass
+
+    def set_dib(self, data: bytes):
+        self._clipboard.OpenClipboard()
+        try:
+            self._clipboard.EmptyClipboard()
+            self._clipboard.SetClipboardData(self._clipboard.CF_DIB, data)
+        finally:
+            self._clipboard.CloseClipboard()
+
+    def get_foreground_process_name(self) -> Optional[str]:
+        hwnd = self._gui.GetForegroundWindow()
+        _, pid = self._process.GetWindowThreadProcessId(hwnd)
+        return self._psutil.Process(pid).name().lower()
+
+
+class FakeBackend(PlatformBackend):
+    """
+    确定性的模拟后端：模拟一个聊天输入框和剪贴板
+
+    快捷键按 Windows 聊天窗口的行为作用于输入框(全选 / 剪切 / 复制 / 粘贴 / 发送),
+    sleep 与各操作的系统延迟只累加到模拟时钟上, 不真正等待, 因此结果可以重复。
+    """
+
+    def __init__(
+            self,
+            process_name: Optional[str] = "qq.exe",
+            hotkey_latency: float = 0.0,
+            clipboard_latency: float = 0.0,
+            select_all_hotkey: str = "ctrl+a",
+            cut_hotkey: str = "ctrl+x",
+            copy_hotkey: str = "ctrl+c",
+            paste_hotkey: str = "ctrl+v",
+            send_hotkey: str = "enter"
+    ):
+        """
+        Args:
+            process_name: 模拟的前台进程名称
+            hotkey_latency: 每次模拟按键的系统延迟(秒)
+            clipboard_latency: 每次读写剪贴板的系统延迟(秒)
+        """
+        self.process_name = process_name
+        self.hotkey_latency = hotkey_latency
+        self.clipboard_latency = clipboard_latency
+        self._keys = {
+            select_all_hotkey: "select_all",
+            cut_hotkey: "cut",
+            copy_hotkey: "copy",
+            paste_hotkey: "paste",
+            send_hotkey: "send",
+        }
+        self._lock = threading.Lock()
+        self.hotkeys = {}
+
+        # 输入框: 文本, 粘贴进去的图片, 是否全选
+        self.input_text = ""
+        self.input_images: List[bytes] = []
+        self.selected = False
+        # 剪贴板
+        self.clipboard_text = ""
+        self.clipboard_dib: Optional[bytes] = None
+        # 已发送的消息 [(模拟时钟, 文本, [DIB 数据, ...]), ...]
+        self.sent: List[Tuple[float, str, List[bytes]]] = []
+        # 模拟时钟(秒), 只计入 sleep 与系统延迟
+        self.simulated_time = 0.0
+
+    def reset(self, text: str = "", image_dib: Optional[bytes] = None, clipboard_text: str = ""):
+        """设置下一次操作前输入框与剪贴板的内容"""
+        with self._lock:
+            self.input_text = text
+            self.input_images = [image_dib] if image_dib else []
+            self.selected = False
+            self.clipboard_text = clipboard_text
+            self.clipboard_dib = None
+            self.sent = []
+            self.simulated_time = 0.0
+
+    def _advance(self, seconds: float):
+        self.simulated_time += seconds
+
+    # ------------------------------------------------------------------------------
+    # 键盘
+    # ------------------------------------------------------------------------------
+    def send_hotkey(self, hotkey: str):
+        with self._lock:
+            self._advance(self.hotkey_latency)
+            action = self._keys.get(hotkey)
+            if action == "select_all":
+                self.selected = True
+            elif action in ("cut", "copy") and self.selected:
+                # 图文混排时剪贴板同时提供文本与第一张图片
+                self.clipboard_text = self.input_text
+                self.clipboard_dib = self.input_images[0] if self.input_images else None
+                if action == "cut":
+                    self.input_text = ""
+                    self.input_images = []
+                self.selected = False
+            elif action == "paste":
+                if self.clipboard_dib is not None:
+                    self.input_images.append(self.clipboard_dib)
+                else:
+                    self.input_text += self.clipboard_text
+                self.selected = False
+            elif action == "send":
+                self.sent.append((self.simulated_time, self.input_text, self.input_images))
+                self.input_text = ""
+                self.input_images = []
+                self.selected = False
+            else:
+                # 程序发出的按键不会触发已注册的热键
+                logging.debug(f"模拟后端忽略快捷键: {hotkey}")
+
+    def add_hotkey(self, hotkey: str, callback: Callable, suppress: bool = False):
+        self.hotkeys[hotkey] = callback
+
+    def trigger(self, hotkey: str):
+        """模拟用户按下已注册的热键"""
+        self.hotkeys[hotkey]()
+
+    def wait(self):
+        pass
+
+    def sleep(self, seconds: float):
+        with self._lock:
+            self._advance(seconds)
+
+    # ------------------------------------------------------------------------------
+    # 剪贴板
+    # ------------------------------------------------------------------------------
+    def get_text(self) -> str:
+        with self._lock:
+            self._advance(self.clipboard_latency)
+            return self.clipboard_text
+
+    def set_text(self, text: str):
+        with self._lock:
+            self._advance(self.clipboard_latency)
+            self.clipboard_text = text
+            self.clipboard_dib = None
+
+    def get_dib(self) -> Optional[bytes]:
+        with self._lock:
+            self._advance(self.clipboard_latency)
+            return self.clipboard_dib
+
+    def set_dib(self, data: bytes):
+        with self._lock:
+            self._advance(self.clipboard_latency)
+            self.clipboard_dib = data
+            self.clipboard_text = ""
+
+    def get_foreground_process_name(self) -> Optional[str]:
+        return self.process_name
+
+
+# ------------------------------------------------------------------------------
+# 当前后端
+# ------------------------------------------------------------------------------
+_backend: Optional[PlatformBackend] = None
+
+
+def get_backend() -> PlatformBackend:
+    """获取当前后端, 未设置时创建 WindowsBackend"""
+    global _backend
+    if _backend is None:
+        _backend = WindowsBackend()
+    return _backend
+
+
+def set_backend(backend: PlatformBackend):
+    """替换当前后端"""
+    global _backend
+    _backend = backend
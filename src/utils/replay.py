@@ -0,0 +1,154 @@
+from typing import Dict, List, Optional
+from PIL import Image
+import threading
+import hashlib
+import json
+import math
+import time
+import os
+
+
+class SessionRecorder:
+    """
+    会话录制：把每次生成的输入(qq、文字、图片、头衔)与各阶段耗时追加到会话目录
+
+    目录结构: session.jsonl 每行一次生成, images/ 下按内容摘要保存输入图片。
+    """
+
+    SESSION_NAME = "session.jsonl"
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._image_dir = os.path.join(directory, "images")
+        os.makedirs(self._image_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+
+    def record(
+            self,
+            qq: str,
+            text: str,
+            image: Optional[Image.Image],
+            title: Optional[dict] = None,
+            timings: Optional[dict] = None
+    ):
+        """追加一条记录"""
+        image_name = None
+        if image is not None:
+            image_name = hashlib.sha1(image.tobytes()).hexdigest()[:16] + ".png"
+            image_path = os.path.join(self._image_dir, image_name)
+            if not os.path.exists(image_path):
+                image.save(image_path)
+        event = {
+            "t": round(time.perf_counter() - self._start, 3),
+            "qq": str(qq),
+            "text": text,
+            "image": image_name,
+            "title": title,
+            "timings": timings or {},
+        }
+        with self._lock, open(os.path.join(self.directory, self.SESSION_NAME), "a", encoding="utf-8") as f:
+            f.write(json.dumps(event, ensure_ascii=False) + "\n")
+
+
+def load_session(directory: str) -> List[dict]:
+    """读取会话目录中的全部记录, 图片加载为 PIL.Image"""
+    events = []
+    with open(os.path.join(directory, SessionRecorder.SESSION_NAME), "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            event = json.loads(line)
+            if event.get("image"):
+                with Image.open(os.path.join(directory, "images", event["image"])) as image:
+                    event["image"] = image.copy()
+            events.append(event)
+    return events
+
+
+# ------------------------------------------------------------------------------
+# 回放
+# ------------------------------------------------------------------------------
+def percentile(values: List[float], p: float) -> float:
+    """最近秩百分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(p / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    """延迟分布(ms)"""
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 2),
+        "p50": round(percentile(values, 50), 2),
+        "p90": round(percentile(values, 90), 2),
+        "p99": round(percentile(values, 99), 2),
+        "max": round(max(values), 2),
+    }
+
+
+def replay_session(generator, backend, events: List[dict], repeat: int = 1, realtime: bool = False) -> dict:
+    """
+    通过模拟后端把录制的会话逐条回放到 generator.generate_image
+
+    端到端延迟 = 实际耗时(读取输入、渲染、编码) + 模拟时钟(按键等待与系统延迟),
+    从按下生成热键开始, 到最后一页被粘贴/发送为止。
+
+    Args:
+        generator: 使用 backend 创建的 EmojiGenerator
+        backend: FakeBackend
+        events: load_session 返回的记录
+        repeat: 回放轮数
+        realtime: 是否按录制时的间隔等待, 以便后台任务(缓存写入、后续页渲染)在两次生成之间完成
+
+    Returns:
+        dict: {"end_to_end": 分布, "stages": {阶段: 分布}, "cache": {结果: 次数}, "pages": 发送的页数}
+    """
+    from src.core.clipboard_manager import ClipboardManager
+
+    end_to_end = []
+    stages: Dict[str, List[float]] = {}
+    cache: Dict[str, int] = {}
+    pages = 0
+    for _ in range(repeat):
+        previous_t = None
+        for event in events:
+            if realtime and previous_t is not None:
+                time.sleep(max(0.0, event["t"] - previous_t))
+            previous_t = event["t"]
+
+            image = event.get("image")
+            backend.reset(
+                text=event.get("text") or "",
+                image_dib=ClipboardManager.encode_dib(image) if image is not None else None
+            )
+            generator.qq = event["qq"]
+            if event.get("title") is not None:
+                generator.qq_title_key[event["qq"]] = event["title"]
+            generator.last_timings = {}
+
+            start = time.perf_counter()
+            backend.trigger(generator.config.hotkey)
+            elapsed = (time.perf_counter() - start) * 1000
+            end_to_end.append(elapsed + backend.simulated_time * 1000)
+
+            timings = generator.last_timings
+            for name, value in timings.items():
+                if name.endswith("_ms"):
+                    stages.setdefault(name, []).append(value)
+            if "cache" in timings:
+                cache[timings["cache"]] = cache.get(timings["cache"], 0) + 1
+            pages += len(backend.sent)
+
+    return {
+        "end_to_end": summarize(end_to_end),
+        "stages": {name: summarize(values) for name, values in stages.items()},
+        "cache": cache,
+        "pages": pages,
+    }
+
@@ -1,8 +1,6 @@
 import logging
 from typing import Optional
-import psutil
-import win32gui
-import win32process
+from .platform_backend import get_backend
 
 
 class SystemUtils:
@@ -12,10 +10,7 @@ class SystemUtils:
     def get_foreground_process_name() -> Optional[str]:
         """获取当前前台窗口的进程名称"""
         try:
-            hwnd = win32gui.GetForegroundWindow()
-            _, pid = win32process.GetWindowThreadProcessId(hwnd)
-            process = psutil.Process(pid)
-            return process.name().lower()
+            return get_backend().get_foreground_process_name()
 
         except Exception as e:
             logging.error(f"无法获取当前进程名称: {e}")
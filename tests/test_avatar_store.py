@@ -0,0 +1,51 @@
+import os
+
+from PIL import Image
+
+from src.core.avatar_store import AvatarStore
+
+
+def make_avatar(path, color=(200, 50, 50, 255)):
+    Image.new("RGBA", (64, 64), color).save(path)
+    return str(path)
+
+
+def test_get_or_create_round_trip(tmp_path):
+    path = make_avatar(tmp_path / "1-a.png")
+    store = AvatarStore(str(tmp_path / "store"))
+    first = store.get_or_create(path, (32, 32))
+    second = store.get(AvatarStore.make_key(path, (32, 32)))
+    assert second is not None
+    assert first.tobytes() == second.tobytes()
+
+
+def test_compact_handles_pipe_in_file_name(tmp_path):
+    path = make_avatar(tmp_path / "1-a|b.png")
+    store = AvatarStore(str(tmp_path / "store"))
+    store.get_or_create(path, (32, 32))
+    store.get_or_create(path, (16, 16))
+    os.remove(path)
+
+    store.compact(str(tmp_path))
+    assert store.get(AvatarStore.make_key(path, (32, 32))) is None
+
+
+def test_get_returns_none_when_pack_was_compacted_away(tmp_path):
+    keep = make_avatar(tmp_path / "1-keep.png")
+    drop = make_avatar(tmp_path / "2-drop.png", (0, 0, 255, 255))
+    directory = str(tmp_path / "store")
+    writer = AvatarStore(directory)
+    writer.get_or_create(keep, (32, 32))
+    writer.get_or_create(drop, (32, 32))
+
+    # 另一个进程在本进程映射旧打包文件之前完成压缩并删除了它
+    reader = AvatarStore(directory)
+    os.remove(drop)
+    writer.compact(str(tmp_path))
+    assert not os.path.exists(os.path.join(directory, "avatars.0.pack"))
+
+    key = AvatarStore.make_key(keep, (32, 32))
+    assert reader.get(key) is None
+    # 重新加载索引后从新一代打包文件读取
+    assert reader.get(key) is not None
+    assert reader.get_or_create(keep, (32, 32)).size == (32, 32)
@@ -0,0 +1,246 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+from io import BytesIO
+import threading
+import json
+import time
+import os
+
+from PIL import Image
+import pytest
+
+from src.utils.http_utils import FetchError, HttpClient
+from src.core import qqbox
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """按路径返回预先设置的故障序列: 状态码、延迟或正常响应"""
+
+    def do_GET(self):
+        server = self.server
+        path = urlparse(self.path).path
+        with server.lock:
+            server.hits[path] = server.hits.get(path, 0) + 1
+            script = server.scripts.get(path, [])
+            action = script.pop(0) if len(script) > 1 else (script[0] if script else (404, b""))
+        status, body = action
+        if status == "slow":
+            time.sleep(body)
+            status, body = 200, b"late"
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except OSError:
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.lock = threading.Lock()
+    server.hits = {}
+    server.scripts = {}
+    server.base = f"http://127.0.0.1:{server.server_address[1]}"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_client(**kwargs):
+    options = {"connect_timeout": 1.0, "read_timeout": 0.3, "retries": 2, "backoff": 0.01}
+    options.update(kwargs)
+    return HttpClient(**options)
+
+
+def png_bytes():
+    with BytesIO() as output:
+        Image.new("RGBA", (64, 64), (0, 120, 255, 255)).save(output, "PNG")
+        return output.getvalue()
+
+
+# ------------------------------------------------------------------------------
+# HttpClient
+# ------------------------------------------------------------------------------
+def test_5xx_is_retried_until_success(stub):
+    stub.scripts["/flaky"] = [(503, b""), (502, b""), (200, b"ok")]
+    res = make_client().get(stub.base + "/flaky")
+    assert res.status_code == 200
+    assert stub.hits["/flaky"] == 3
+
+
+def test_5xx_exhausts_retries(stub):
+    stub.scripts["/down"] = [(500, b"")]
+    with pytest.raises(FetchError):
+        make_client(retries=1, failure_threshold=10).get(stub.base + "/down")
+    assert stub.hits["/down"] == 2
+
+
+def test_4xx_is_returned_without_retry(stub):
+    stub.scripts["/missing"] = [(404, b"")]
+    res = make_client().get(stub.base + "/missing")
+    assert res.status_code == 404
+    assert stub.hits["/missing"] == 1
+
+
+def test_read_timeout_raises_fetch_error(stub):
+    stub.scripts["/slow"] = [("slow", 1.0)]
+    start = time.monotonic()
+    with pytest.raises(FetchError):
+        make_client(retries=0).get(stub.base + "/slow")
+    assert time.monotonic() - start < 1.0
+
+
+def test_deadline_stops_retries(stub):
+    stub.scripts["/slow"] = [("slow", 1.0)]
+    client = make_client(read_timeout=0.3, retries=5, failure_threshold=10)
+    start = time.monotonic()
+    with pytest.raises(FetchError):
+        client.get(stub.base + "/slow", deadline=time.monotonic() + 0.5)
+    assert time.monotonic() - start < 0.9
+    assert stub.hits["/slow"] <= 2
+
+
+def test_breaker_opens_and_rejects_without_request(stub):
+    stub.scripts["/down"] = [(500, b"")]
+    client = make_client(retries=0, failure_threshold=2, reset_timeout=60)
+    for _ in range(2):
+        with pytest.raises(FetchError):
+            client.get(stub.base + "/down")
+    assert client.breaker_for(stub.base).is_open
+
+    with pytest.raises(FetchError, match="熔断"):
+        client.get(stub.base + "/down")
+    assert stub.hits["/down"] == 2
+
+
+def test_breaker_half_open_recovers(stub):
+    stub.scripts["/recover"] = [(500, b""), (200, b"ok")]
+    client = make_client(retries=0, failure_threshold=1, reset_timeout=0.05)
+    with pytest.raises(FetchError):
+        client.get(stub.base + "/recover")
+    time.sleep(0.06)
+    assert client.get(stub.base + "/recover").status_code == 200
+    assert not client.breaker_for(stub.base).is_open
+
+
+# ------------------------------------------------------------------------------
+# get_qq_info: 负缓存与占位头像
+# ------------------------------------------------------------------------------
+class RedirectingClient(HttpClient):
+    """把昵称接口和头像接口的请求转发到本地 stub, 两者仍使用各自的熔断器"""
+
+    def __init__(self, base, **kwargs):
+        super().__init__(**kwargs)
+        self.base = base
+
+    def get(self, url, deadline=None):
+        parsed = urlparse(url)
+        return super().get(f"{self.base}/{parsed.netloc}{parsed.path}", deadline=deadline)
+
+    def breaker_for(self, url):
+        # 以转发前的上游主机(路径第一段)区分熔断器
+        return super().breaker_for("http://" + urlparse(url).path.split("/")[1])
+
+
+@pytest.fixture
+def qq_env(stub, tmp_path, monkeypatch):
+    monkeypatch.setenv("avatar_cache_location", str(tmp_path))
+    previous = qqbox.http_client
+    qqbox.set_http_client(RedirectingClient(stub.base, connect_timeout=1.0, read_timeout=0.3,
+                                            retries=0, backoff=0.01, failure_threshold=10))
+    qqbox.clear_negative_cache()
+    yield stub
+    qqbox.clear_negative_cache()
+    qqbox.set_http_client(previous)
+
+
+NAME_PATH = "/api.mmp.cc/api/qqname"
+AVATAR_PATH = "/q1.qlogo.cn/g"
+
+
+def name_body(name):
+    return json.dumps({"data": {"name": name}}).encode("utf-8")
+
+
+def test_avatar_failure_uses_placeholder_and_keeps_nickname(qq_env):
+    qq_env.scripts[NAME_PATH] = [(200, name_body("Alice"))]
+    qq_env.scripts[AVATAR_PATH] = [(500, b"")]
+
+    first = qqbox.get_qq_info("777")
+    second = qqbox.get_qq_info("777")
+
+    assert first["placeholder"] and second["placeholder"]
+    assert first["name"] == second["name"] == "Alice"
+    assert first["avatar_path"] == second["avatar_path"]
+    # 第二次命中负缓存, 不再请求
+    assert qq_env.hits[NAME_PATH] == 1
+    assert qq_env.hits[AVATAR_PATH] == 1
+
+
+def test_negative_cache_expires(qq_env, monkeypatch):
+    monkeypatch.setattr(qqbox, "NEGATIVE_CACHE_TTL", 0.05)
+    qq_env.scripts[NAME_PATH] = [(200, name_body("Alice"))]
+    qq_env.scripts[AVATAR_PATH] = [(500, b""), (200, png_bytes())]
+
+    assert qqbox.get_qq_info("778")["placeholder"]
+    time.sleep(0.06)
+    info = qqbox.get_qq_info("778")
+    assert not info.get("placeholder")
+    assert info["name"] == "Alice"
+
+
+def test_nickname_failure_still_downloads_avatar(qq_env):
+    qq_env.scripts[NAME_PATH] = [(503, b"")]
+    qq_env.scripts[AVATAR_PATH] = [(200, png_bytes())]
+
+    info = qqbox.get_qq_info("779")
+    assert not info.get("placeholder")
+    assert info["name"] == "779"
+    assert qq_env.hits[AVATAR_PATH] == 1
+    with Image.open(info["avatar_path"]) as avatar:
+        assert avatar.mode == "RGBA"
+
+
+def test_nickname_failure_is_retried_after_expiry(qq_env, monkeypatch):
+    monkeypatch.setattr(qqbox, "NEGATIVE_CACHE_TTL", 0.05)
+    qq_env.scripts[NAME_PATH] = [(503, b""), (200, name_body("Alice"))]
+    qq_env.scripts[AVATAR_PATH] = [(200, png_bytes())]
+
+    first = qqbox.get_qq_info("780")
+    second = qqbox.get_qq_info("780")
+    assert first["name"] == second["name"] == "780"
+    assert qq_env.hits[NAME_PATH] == 1
+
+    # 过期后重新获取昵称, 已下载的头像直接改名复用
+    time.sleep(0.06)
+    third = qqbox.get_qq_info("780")
+    assert third["name"] == "Alice"
+    assert not third.get("placeholder_name")
+    assert os.path.basename(third["avatar_path"]) == "780-Alice.png"
+    assert qq_env.hits[AVATAR_PATH] == 1
+
+    # 之后命中磁盘缓存
+    assert qqbox.get_qq_info("780")["name"] == "Alice"
+    assert qq_env.hits[NAME_PATH] == 2
+
+
+def test_blackholed_upstreams_share_one_deadline(qq_env, monkeypatch):
+    monkeypatch.setattr(qqbox, "QQ_INFO_DEADLINE", 0.5)
+    qqbox.set_http_client(RedirectingClient(qq_env.base, connect_timeout=1.0, read_timeout=0.3,
+                                            retries=2, backoff=0.01, failure_threshold=10))
+    qq_env.scripts[NAME_PATH] = [("slow", 1.0)]
+    qq_env.scripts[AVATAR_PATH] = [("slow", 1.0)]
+
+    # 两个上游各自重试需要约 2 x 3 x 0.3s, 总时限内返回占位结果
+    start = time.monotonic()
+    info = qqbox.get_qq_info("781")
+    assert time.monotonic() - start < 0.9
+    assert info["placeholder"]
+    assert info["name"] == "781"
@@ -0,0 +1,49 @@
+import threading
+
+from src.core.qqbox import ChatBubbleGenerator
+
+INFO = {"qq": "12345", "name": "test", "avatar_path": "12345-test.png"}
+
+
+def texts(display_list):
+    return [item["text"] for layer in display_list["layers"] for item in layer["items"] if item["op"] == "text"]
+
+
+def test_note_only_replaces_nickname_without_title():
+    engine = ChatBubbleGenerator().layout_engine
+    plain = engine.layout_message(INFO, "hello", None, None)
+    noted = engine.layout_message(INFO, "hello", None, {"color": None, "content": None, "notes": "alias"})
+
+    assert len(noted["layers"]) == len(plain["layers"])
+    assert not any(item["op"] == "rounded_rect" for layer in noted["layers"][1:] for item in layer["items"])
+    assert "alias" in texts(noted) and "test" not in texts(noted)
+
+
+def test_title_content_adds_title_layer():
+    engine = ChatBubbleGenerator().layout_engine
+    plain = engine.layout_message(INFO, "hello", None, None)
+    titled = engine.layout_message(INFO, "hello", None, {"color": "2", "content": "admin", "notes": None})
+
+    assert len(titled["layers"]) == len(plain["layers"]) + 1
+    assert "admin" in texts(titled) and "test" in texts(titled)
+
+
+def test_layout_cache_is_shared_between_threads():
+    engine = ChatBubbleGenerator().layout_engine
+    engine.cache_size = 4
+    errors = []
+
+    def worker(offset):
+        try:
+            for i in range(200):
+                engine.layout_message(INFO, f"message {(i + offset) % 12}", None, None)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert len(engine._cache) <= engine.cache_size
@@ -0,0 +1,21 @@
+import logging
+
+from src.utils import logger
+
+
+def test_setup_logger_again_closes_previous_handlers(tmp_path):
+    log_file = str(tmp_path / "app.log")
+    first = logger.setup_logger("INFO", log_file)
+    file_handler = first.handlers[1]
+
+    second = logger.setup_logger("INFO", log_file)
+    try:
+        # 旧的文件处理器已经关闭, 日志文件只被新的处理器打开
+        assert file_handler.stream is None
+        logging.info("second")
+        second.stop()
+        second.start()
+        with open(log_file, encoding="utf-8") as f:
+            assert "second" in f.read()
+    finally:
+        logger._stop_listener()
@@ -0,0 +1,101 @@
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+import pytest
+
+from src.core.qqbox import ChatBubbleGenerator
+
+# 各图像模式每像素字节数
+BYTES_PER_PIXEL = {"RGBA": 4, "RGB": 3, "L": 1}
+# 属于气泡图层的中间画布(不含输出画布与头像)
+BUBBLE_PURPOSES = ("layer", "supersample", "downsample", "image_")
+# 介于最低倍率与完整倍率的估算值之间
+BUDGET = 5 * 1024 * 1024
+
+
+@pytest.fixture
+def message(tmp_path):
+    avatar_path = tmp_path / "12345-test.png"
+    Image.new("RGBA", (640, 640), (200, 50, 50, 255)).save(avatar_path)
+    info = {"qq": "12345", "name": "test", "avatar_path": str(avatar_path)}
+    image = Image.new("RGB", (1600, 1200), (10, 200, 30))
+    return info, "hello world " * 30, image
+
+
+def render(generator, info, text, image):
+    display_list = generator.layout_engine.layout_message(info, text, image.size)
+    output = generator.render_display_list(display_list, image)
+    return display_list, output
+
+
+def allocated_bytes(allocations, purposes):
+    return sum(
+        w * h * BYTES_PER_PIXEL[mode]
+        for purpose, mode, (w, h) in allocations
+        if purpose.startswith(purposes)
+    )
+
+
+def test_unlimited_budget_uses_full_supersampling(message):
+    info, text, image = message
+    generator = ChatBubbleGenerator(memory_budget=None)
+    render(generator, info, text, image)
+    assert not generator.last_render_degraded
+    assert generator.last_render_scale == generator.SCALE
+
+
+def test_small_budget_degrades_and_stays_within_estimate(message):
+    info, text, image = message
+    generator = ChatBubbleGenerator(memory_budget=BUDGET)
+    display_list, output = render(generator, info, text, image)
+    rasterizer = generator.rasterizer
+
+    assert generator.last_render_degraded
+    assert generator.last_render_scale < generator.SCALE
+
+    bubble = display_list["layers"][0]
+    ss = rasterizer.select_supersample(bubble, 1.0, BUDGET)
+    scaled, fixed = rasterizer.estimate_layer_bytes(bubble)
+    estimate = scaled * ss * ss + fixed
+
+    # 选中的倍率满足预算, 实际分配的中间画布不超过估算值
+    assert estimate <= BUDGET
+    assert allocated_bytes(rasterizer.last_allocations, BUBBLE_PURPOSES) <= estimate
+
+    # 降级不改变输出尺寸
+    assert output.size == (display_list["width"], display_list["height"])
+
+
+def test_full_supersampling_would_exceed_budget(message):
+    info, text, image = message
+    generator = ChatBubbleGenerator(memory_budget=None)
+    display_list, _ = render(generator, info, text, image)
+    # 不限制预算时实际分配超过预算, 说明上面的用例确实发生了降级
+    assert allocated_bytes(generator.rasterizer.last_allocations, BUBBLE_PURPOSES) > BUDGET
+
+
+class CountingExecutor(ThreadPoolExecutor):
+    def __init__(self):
+        super().__init__(max_workers=2)
+        self.submitted = 0
+
+    def submit(self, *args, **kwargs):
+        self.submitted += 1
+        return super().submit(*args, **kwargs)
+
+
+def test_parallel_render_falls_back_to_sequential_over_budget(message):
+    info, text, image = message
+    generator = ChatBubbleGenerator(memory_budget=BUDGET)
+    display_list = generator.layout_engine.layout_message(info, text, image.size)
+    rasterizer = generator.rasterizer
+
+    with CountingExecutor() as executor:
+        # 单个图层满足预算, 但各图层同时准备的总和超出预算
+        parallel = rasterizer.render(display_list, {"image": image}, 1.0, BUDGET, executor)
+        assert executor.submitted == 0
+        unlimited = rasterizer.render(display_list, {"image": image}, 1.0, None, executor)
+        assert executor.submitted > 0
+
+    # 无论是否退回逐层渲染, 输出都与串行渲染逐像素一致
+    assert parallel.tobytes() == rasterizer.render(display_list, {"image": image}, 1.0, BUDGET).tobytes()
+    assert unlimited.tobytes() == rasterizer.render(display_list, {"image": image}, 1.0, None).tobytes()